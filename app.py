@@ -1,12 +1,18 @@
 import streamlit as st
 import pandas as pd
-import sqlite3
 import plotly.express as px
-from optimizer import ExamScheduler
+from optimizer import ExamScheduler, schedule_generation
+from cpsat_solver import CPSatScheduler, CPSAT_AVAILABLE
 import datetime
 
+import contextlib
 import os
-from seed import init_db, generate_data, create_connection
+import tempfile
+import queue
+from seed import init_db, generate_data
+from search import name_search_queries
+from export import export, FORMATS, PARQUET_AVAILABLE
+from storage import DATABASE_URL, open_storage
 
 # Custom CSS for Right-Side Sidebar & Premium Institutional Look
 st.markdown("""
@@ -134,37 +140,99 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-# Database Connection
-DB_PATH = "exams.db"
-APP_VERSION = "2.4.0" # Version de l'application (Capacités: Salles 20, Amphis 50)
+# Database Connection (SQLite par défaut ; PostgreSQL via DATABASE_URL=postgresql://...)
+DB_PATH = DATABASE_URL
+
+# Algorithmes de planification proposés (Libellé -> mode ExamScheduler)
+SCHEDULING_MODES = {
+    "Glouton (par effectif)": "greedy",
+    "Coloration de graphe (DSatur)": "dsatur",
+}
+if CPSAT_AVAILABLE:
+    SCHEDULING_MODES["Programmation par contraintes (CP-SAT)"] = "cpsat"
+
+READ_CACHE_KIB = 32768  # Cache de pages SQLite par connexion de lecture (Kio)
+READ_POOL_SIZE = 8  # Connexions de lecture SQLite inactives conservées
+QUERY_CACHE_ENTRIES = 512  # Résultats de requêtes de pages conservés en mémoire
+EXPORT_CACHE_ENTRIES = 256  # Fichiers d'export (agendas .ics individuels surtout) conservés en mémoire
+SEARCH_LIMIT = 5  # Étudiants proposés par la recherche "Mon Planning"
+
+# Exports téléchargeables (Libellé -> contenu export.py) et formats proposés
+EXPORT_KINDS = {
+    "Planning complet": "planning",
+    "Feuilles d'émargement (par salle)": "salles",
+}
+EXPORT_FORMATS = [fmt for fmt in FORMATS if fmt != "parquet" or PARQUET_AVAILABLE]
 
 # --- GESTION DE LA CONNEXION DB ---
-def get_connection():
-    """Établit une connexion à la base de données SQLite."""
-    conn = sqlite3.connect(DB_PATH)
-    return conn
+@st.cache_resource
+def get_storage():
+    """Stockage (SQLite ou PostgreSQL, voir storage.py), unique pour le processus."""
+    return open_storage(DB_PATH)
+
+class ReadConnectionPool:
+    """
+    Connexions en lecture partagées par le processus.
+    SQLite : file bornée de connexions en lecture seule, empruntées le temps d'une requête par n'importe quel
+    thread (Streamlit exécute chaque rerun dans un nouveau thread) ; au plus `size` connexions inactives
+    sont conservées, les connexions ouvertes en surplus lors d'un pic sont fermées après usage.
+    En mode WAL, les lectures ne bloquent pas (et ne sont pas bloquées par) la sauvegarde d'un planning.
+    PostgreSQL : connexion empruntée au pool SQLAlchemy le temps de la requête.
+    """
+    def __init__(self, storage, size=READ_POOL_SIZE, cache_kib=READ_CACHE_KIB):
+        self.storage = storage
+        self.cache_kib = cache_kib
+        self._idle = queue.LifoQueue(maxsize=size)  # La plus récemment utilisée d'abord (cache de pages chaud)
+
+    def _open(self):
+        conn = self.storage.connect(readonly=True)
+        conn.execute(f"PRAGMA cache_size=-{self.cache_kib}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Connexion de lecture empruntée le temps du bloc `with`."""
+        if self.storage.dialect != "sqlite":
+            conn = self.storage.connect(readonly=True)
+            try:
+                yield conn
+            finally:
+                conn.close()  # Rendue au pool
+            return
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._open()
+        try:
+            yield conn
+        finally:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+@st.cache_resource
+def get_read_pool():
+    """Gestionnaire de connexions de lecture, unique pour le processus."""
+    return ReadConnectionPool(get_storage())
 
 @st.cache_resource
 def init_app():
-    """Initialise l'application au premier lancement (Migration DB)."""
-    conn = get_connection()
+    """Initialise l'application au premier lancement (Migration DB en place, données conservées)."""
+    storage = get_storage()
+    conn = storage.connect()
+    storage.migrate(conn)
     cursor = conn.cursor()
-    try:
-        cursor.execute("CREATE TABLE IF NOT EXISTS app_meta (version TEXT)")
-        cursor.execute("SELECT version FROM app_meta LIMIT 1")
-        version_row = cursor.fetchone()
-        db_version = version_row[0] if version_row else None
-    except:
-        db_version = None
-        
-    if db_version != APP_VERSION:
-        # Si la version a changé, on réinitialise tout (Seed data)
-        init_db(conn)
-        generate_data(conn)
-        cursor.execute("DROP TABLE IF EXISTS app_meta")
-        cursor.execute("CREATE TABLE app_meta (version TEXT)")
-        cursor.execute("INSERT INTO app_meta (version) VALUES (?)", (APP_VERSION,))
-        conn.commit()
+    if storage.dialect == "sqlite":
+        # Journal WAL (persistant) : lecteurs et écrivain concurrents sans verrou global
+        cursor.execute("PRAGMA journal_mode=WAL")
+    # Base neuve ou incomplète (sans étudiants) : remise à zéro puis génération des données de démonstration
+    cursor.execute("SELECT COUNT(*) FROM etudiants")
+    if cursor.fetchone()[0] == 0:
+        init_db(conn, storage)
+        generate_data(conn, storage=storage)
+    conn.commit()  # Fin de la transaction de lecture (PostgreSQL : pas de verrou conservé sur etudiants)
     return conn
 
 # Initialisation de l'application au démarrage
@@ -259,11 +327,63 @@ with st.sidebar:
 # --- MAIN CONTENT AREA ---
 
 # Helper functions
-def load_data(query):
-    conn = get_connection()
-    df = pd.read_sql(query, conn)
-    conn.close()
-    return df
+@st.cache_data(max_entries=QUERY_CACHE_ENTRIES, show_spinner=False)
+def cached_query(query, params, generation):
+    """Résultat d'une requête pour une génération de planning donnée (invalidé par la suivante)."""
+    with get_read_pool().connection() as conn:
+        return get_storage().read_frame(conn, query, params)
+
+def load_data(query, params=None):
+    """Exécute une requête de page : lue dans le cache tant qu'aucun nouveau planning n'a été sauvegardé."""
+    with get_read_pool().connection() as conn:
+        generation = schedule_generation(conn)
+    return cached_query(query, tuple(params) if params is not None else None, generation)
+
+@st.cache_data(max_entries=EXPORT_CACHE_ENTRIES, show_spinner=False)
+def cached_export(kind, fmt, filter_id, generation):
+    """Export écrit par paquets dans un fichier temporaire (voir export.py), puis lu ; mis en cache par génération."""
+    fd, path = tempfile.mkstemp(suffix="." + FORMATS[fmt][1])
+    os.close(fd)
+    try:
+        with get_read_pool().connection() as conn:
+            export(conn, kind, fmt, path, filter_id, storage=get_storage())
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+def export_bytes(kind, fmt, filter_id=None):
+    """Contenu d'un export pour st.download_button : recalculé seulement après la sauvegarde d'un nouveau planning."""
+    with get_read_pool().connection() as conn:
+        generation = schedule_generation(conn)
+    return cached_export(kind, fmt, filter_id, generation)
+
+def search_students(text, limit=SEARCH_LIMIT):
+    """
+    Recherche d'étudiants par nom/prénom via l'index plein texte (etudiants_fts).
+    Classement : mots complets avant préfixes ; chaque niveau s'arrête dès `limit` résultats.
+    PostgreSQL : préfixe de chaque mot sur le nom ou le prénom (index lower(...) text_pattern_ops).
+    """
+    if get_storage().dialect != "sqlite":
+        words = [w.lower() for w in text.split()]
+        if not words:
+            return pd.DataFrame(columns=['id', 'nom', 'prenom', 'promo'])
+        where = " AND ".join(["(lower(nom) LIKE ? OR lower(prenom) LIKE ?)"] * len(words))
+        return load_data(f"SELECT id, nom, prenom, promo FROM etudiants WHERE {where} ORDER BY nom, prenom LIMIT ?",
+                         [p for w in words for p in (w + "%", w + "%")] + [limit])
+    found = pd.DataFrame(columns=['id', 'nom', 'prenom', 'promo'])
+    for match in name_search_queries(text):
+        hits = load_data("""
+            SELECT e.id, e.nom, e.prenom, e.promo
+            FROM etudiants_fts
+            JOIN etudiants e ON e.id = etudiants_fts.rowid
+            WHERE etudiants_fts MATCH ?
+            LIMIT ?
+        """, (match, limit))
+        found = pd.concat([found, hits[~hits['id'].isin(found['id'])]], ignore_index=True)
+        if len(found) >= limit:
+            break
+    return found.head(limit)
 
 if not is_authenticated:
     st.markdown("""
@@ -291,29 +411,33 @@ st.markdown(f"""
 if current_page == "Tableau de bord":
     st.markdown('<h1 style="text-align: center; margin-bottom: 2rem;">📊 Tableau de Bord</h1>', unsafe_allow_html=True)
     
+    # Résumé précalculé à chaque génération (dashboard_summary) : une seule petite table lue
+    summary = load_data("SELECT section, label, value FROM dashboard_summary")
+    def summary_section(section, label_col, value_col):
+        rows = summary[summary['section'] == section]
+        return pd.DataFrame({label_col: rows['label'].values, value_col: rows['value'].astype(int).values})
+    totals = dict(zip(*summary_section('totaux', 'label', 'value').values.T))
+    
     # Statistics
     m1, m2, m3, m4 = st.columns(4)
     
-    conn = get_connection()
-    
     with m1:
-        nb_etudiants = pd.read_sql("SELECT COUNT(*) FROM etudiants", conn).iloc[0,0]
-        st.metric("👥 Total Étudiants", f"{nb_etudiants:,}")
+        st.metric("👥 Total Étudiants", f"{totals.get('etudiants', 0):,}")
         
     with m2:
         # Unique exams (Modules scheduled)
-        nb_examens = pd.read_sql("SELECT COUNT(DISTINCT module_id) FROM examens", conn).iloc[0,0]
-        st.metric("📝 Examens Planifiés", f"{nb_examens}")
+        st.metric("📝 Examens Planifiés", f"{totals.get('examens', 0)}")
         
     with m3:
-        nb_salles = pd.read_sql("SELECT COUNT(DISTINCT salle_id) FROM examens", conn).iloc[0,0]
-        total_salles = pd.read_sql("SELECT COUNT(*) FROM lieux_examen", conn).iloc[0,0]
-        st.metric("🏛️ Salles Utilisées", f"{nb_salles}/{total_salles}")
+        st.metric("🏛️ Salles Utilisées", f"{totals.get('salles_utilisees', 0)}/{totals.get('salles_total', 0)}")
         
     with m4:
-        st.metric("⚠️ Taux Conflits", "0.0%", delta="OK", delta_color="normal")
-        
-    conn.close()
+        # Examens en trop d'un même étudiant le même jour, rapportés au nombre de convocations
+        conflicts = totals.get('conflits', 0)
+        conflict_rate = 100 * conflicts / totals['convocations'] if totals.get('convocations') else 0.0
+        st.metric("⚠️ Taux Conflits", f"{conflict_rate:.1f}%",
+                  delta="OK" if conflicts == 0 else f"{conflicts} conflit(s)",
+                  delta_color="normal" if conflicts == 0 else "inverse")
     
     st.markdown("<br>", unsafe_allow_html=True)
     
@@ -323,14 +447,7 @@ if current_page == "Tableau de bord":
     with c1:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader("📈 Examens par Faculté")
-        df_dept = load_data("""
-            SELECT d.nom as Faculté, COUNT(DISTINCT ex.module_id) as Examens
-            FROM examens ex
-            JOIN modules m ON ex.module_id = m.id
-            JOIN formations f ON m.formation_id = f.id
-            JOIN departements d ON f.dept_id = d.id
-            GROUP BY d.nom
-        """)
+        df_dept = summary_section('examens_par_faculte', 'Faculté', 'Examens')
         if not df_dept.empty:
             fig = px.bar(df_dept, x='Faculté', y='Examens', color='Faculté', template='plotly_white')
             # Hide legend if it takes too much space
@@ -343,14 +460,7 @@ if current_page == "Tableau de bord":
     with c2:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader("👥 Étudiants par Spécialité")
-        df_etu = load_data("""
-            SELECT f.nom as Spécialité, COUNT(e.id) as Etudiants
-            FROM etudiants e
-            JOIN formations f ON e.formation_id = f.id
-            GROUP BY f.nom
-            ORDER BY Etudiants DESC
-            LIMIT 10
-        """)
+        df_etu = summary_section('etudiants_par_formation', 'Spécialité', 'Etudiants').nlargest(10, 'Etudiants')
         if not df_etu.empty:
             fig2 = px.bar(df_etu, x='Etudiants', y='Spécialité', orientation='h', template='plotly_white', color='Etudiants')
             fig2.update_layout(showlegend=False, xaxis_title=None, yaxis_title=None, margin=dict(l=0,r=0,t=0,b=0), height=300)
@@ -360,25 +470,32 @@ if current_page == "Tableau de bord":
         st.markdown('</div>', unsafe_allow_html=True)
         
     # Occupation Row
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.subheader("🏁 Occupation Globale (Salles vs Amphis)")
-    try:
-        conn = get_connection()
-        type_usage = pd.read_sql("""
-            SELECT l.type, COUNT(DISTINCT e.salle_id) as used
-            FROM lieux_examen l
-            LEFT JOIN examens e ON l.id = e.salle_id
-            GROUP BY l.type
-        """, conn)
+    c3, c4 = st.columns([1, 1])
+    
+    with c3:
+        st.markdown('<div class="card">', unsafe_allow_html=True)
+        st.subheader("🏁 Occupation Globale (Salles vs Amphis)")
+        type_usage = summary_section('occupation_type', 'type', 'used')
         if not type_usage.empty:
             fig_pie = px.pie(type_usage, values='used', names='type', hole=0.7, color_discrete_sequence=['#4338ca', '#0ea5e9', '#e2e8f0'])
             fig_pie.update_layout(showlegend=True, margin=dict(l=0,r=0,t=0,b=0), height=250)
             st.plotly_chart(fig_pie, use_container_width=True)
         else:
              st.info("Pas d'occupation.")
-    except:
-         st.info("No data")
-    st.markdown('</div>', unsafe_allow_html=True)
+        st.markdown('</div>', unsafe_allow_html=True)
+    
+    with c4:
+        st.markdown('<div class="card">', unsafe_allow_html=True)
+        st.subheader("👨‍🏫 Charge des Surveillants")
+        proctor_load = summary_section('charge_surveillants', 'Surveillances', 'Professeurs')
+        if not proctor_load.empty:
+            proctor_load = proctor_load.astype({'Surveillances': int}).sort_values('Surveillances')
+            fig_load = px.bar(proctor_load, x='Surveillances', y='Professeurs', template='plotly_white')
+            fig_load.update_layout(xaxis_title="Surveillances", yaxis_title=None, margin=dict(l=0,r=0,t=0,b=0), height=250)
+            st.plotly_chart(fig_load, use_container_width=True)
+        else:
+             st.info("Aucune surveillance.")
+        st.markdown('</div>', unsafe_allow_html=True)
 
 
 # --- PAGE: Créer Emploi du temps ---
@@ -400,21 +517,63 @@ elif current_page == "Créer Emploi du temps":
         
         col_opt1, col_opt2 = st.columns(2)
         with col_opt1:
-            append_mode = st.checkbox("Mode Sans Conflit (Incremental)", value=False, help="Décocher pour écraser")
+            append_mode = st.checkbox("Mode Sans Conflit (Incremental)", value=False,
+                                      help="Conserve le planning des autres spécialités et re-planifie uniquement la sélection. Décocher pour écraser")
+        with col_opt2:
+            algo_label = st.selectbox("Algorithme", list(SCHEDULING_MODES.keys()),
+                                      help="La coloration de graphe tasse la session sur moins de jours")
+            n_starts = st.number_input("Départs aléatoires (multi-start)", min_value=1, max_value=64, value=1,
+                                       help="Plusieurs ordres de placement calculés en parallèle ; le meilleur planning est conservé")
         
         submitted = st.form_submit_button("🚀 Lancer la Génération")
     
-    if submitted:
+    if submitted and end_date < start_date:
+        st.error("La date de fin doit être postérieure ou égale à la date de début.")
+    elif submitted:
         formation_ids = []
         if selected_formations:
             formation_ids = formations[formations['nom'].isin(selected_formations)]['id'].tolist()
             
-        with st.spinner("Optimisation en cours (Répartition et affectation nominative)..."):
-            scheduler = ExamScheduler(DB_PATH)
-            nb_gen = scheduler.generate_schedule(start_date, end_date, formation_ids, append=append_mode)
+        mode = SCHEDULING_MODES[algo_label]
+        scheduler = CPSatScheduler(DB_PATH) if mode == "cpsat" else ExamScheduler(DB_PATH)
+        
+        if n_starts > 1:
+            with st.spinner("Optimisation en cours (Répartition et affectation nominative)..."):
+                nb_gen = scheduler.generate_schedule(start_date, end_date, formation_ids, append=append_mode,
+                                                     mode=mode, n_starts=int(n_starts))
+        else:
+            # Génération pas à pas : barre de progression, arrêt anticipé (planning partiel conservé)
+            st.button("⏹️ Arrêter la génération", key="stop_generation")
+            progress_bar = st.progress(0.0, text="Optimisation en cours (Répartition et affectation nominative)...")
+            events = scheduler.iter_schedule(start_date, end_date, formation_ids, append=append_mode, mode=mode)
+            nb_gen = 0
+            try:
+                for ev in events:
+                    nb_gen += len(ev['salles'])
+                    status = f"{ev['date_examen']} {ev['creneau_debut']}" if ev['placed'] else "non planifié"
+                    progress_bar.progress(ev['progress'], text=f"Module {ev['module_id']} : {status}")
+            finally:
+                events.close()
         
         st.success(f"✅ Génération terminée ! {nb_gen} créneaux planifiés avec affectation des étudiants.")
+        if scheduler.unscheduled:
+            st.warning(f"⚠️ {len(scheduler.unscheduled)} module(s) non planifié(s) : {', '.join(map(str, scheduler.unscheduled))}")
         st.balloons()
+        
+        # Instrumentation : temps par phase et raisons de rejet des créneaux sondés
+        stats = scheduler.stats
+        st.subheader("⏱️ Diagnostic de la génération")
+        phase_cols = st.columns(len(stats.phases))
+        for col, (phase, secs) in zip(phase_cols, stats.phases.items()):
+            col.metric(phase.replace("_", " ").capitalize(), f"{secs:.2f} s")
+        
+        rejections = stats.rejection_totals()
+        st.caption(f"{sum(stats.probes.values())} sondages jour/créneau — rejets : "
+                   f"conflit étudiant {rejections['conflit_etudiant']}, "
+                   f"capacité salles {rejections['capacite_salles']}, "
+                   f"manque de surveillants {rejections['manque_surveillants']}")
+        with st.expander("Sondages par module"):
+            st.dataframe(stats.modules_frame(), use_container_width=True, hide_index=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
 
@@ -438,10 +597,10 @@ elif current_page == "Voir Emplois du temps":
             e.date_examen, 
             e.creneau_debut, 
             e.creneau_fin, 
-            m.nom as Module, 
-            f.nom as Spécialité,
-            s.nom as Salle, 
-            p.nom || ' ' || p.prenom as Surveillant
+            m.nom as "Module", 
+            f.nom as "Spécialité",
+            s.nom as "Salle", 
+            p.nom || ' ' || p.prenom as "Surveillant"
         FROM examens e
         JOIN modules m ON e.module_id = m.id
         JOIN formations f ON m.formation_id = f.id
@@ -449,12 +608,14 @@ elif current_page == "Voir Emplois du temps":
         LEFT JOIN professeurs p ON e.prof_surveillant_id = p.id
     """
     
+    params = None
     if selected_formation != "Toutes les spécialités":
-        base_query += f" WHERE f.nom = '{selected_formation}'"
+        base_query += " WHERE f.nom = ?"
+        params = (selected_formation,)
         
     base_query += " ORDER BY e.date_examen, e.creneau_debut"
     
-    df_raw = load_data(base_query)
+    df_raw = load_data(base_query, params)
     
     if df_raw.empty:
         st.warning("Aucun examen planifié pour cette sélection.")
@@ -466,14 +627,25 @@ elif current_page == "Voir Emplois du temps":
         
         st.dataframe(df_display, use_container_width=True, hide_index=True)
         
-        csv = df_display.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            "📥 Télécharger le Planning", 
-            csv, 
-            f"planning_{datetime.date.today()}.csv", 
-            "text/csv",
-            key='download-csv'
-        )
+        # Export (planning de la sélection ou feuilles d'émargement), généré à la demande
+        c_exp1, c_exp2 = st.columns(2)
+        with c_exp1:
+            export_label = st.selectbox("Export", list(EXPORT_KINDS))
+        with c_exp2:
+            export_fmt = st.selectbox("Format", EXPORT_FORMATS)
+        export_kind = EXPORT_KINDS[export_label]
+        filter_id = None
+        if export_kind == "planning" and params:
+            filter_id = int(formations.loc[formations['nom'] == selected_formation, 'id'].iloc[0])
+        
+        if st.button("⚙️ Préparer l'export", key='prepare-export'):
+            st.download_button(
+                "📥 Télécharger", 
+                export_bytes(export_kind, export_fmt, filter_id), 
+                f"{export_kind}_{datetime.date.today()}.{FORMATS[export_fmt][1]}", 
+                FORMATS[export_fmt][0],
+                key='download-export'
+            )
             
     st.markdown('</div>', unsafe_allow_html=True)
 
@@ -483,60 +655,56 @@ elif current_page == "Répartition Salles":
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.write("Consultez la liste nominative des étudiants par salle d'examen.")
     
-    # Cascade Filters
-    conn = get_connection()
-    depts = pd.read_sql("SELECT id, nom FROM departements", conn)
-    dept_sel = st.selectbox("Faculté", depts['nom'])
+    # Cascade Filters (sélection par identifiant, libellés via format_func)
+    depts = load_data("SELECT id, nom FROM departements ORDER BY nom")
+    dept_names = dict(zip(depts['id'], depts['nom']))
+    dept_id = st.selectbox("Faculté", list(dept_names), format_func=dept_names.get)
     
-    if dept_sel:
-        dept_id = depts[depts['nom'] == dept_sel]['id'].values[0]
-        formats = pd.read_sql(f"SELECT id, nom FROM formations WHERE dept_id = {dept_id}", conn)
-        fmt_sel = st.selectbox("Spécialité", formats['nom'])
+    if dept_id is not None:
+        formats = load_data("SELECT id, nom FROM formations WHERE dept_id = ? ORDER BY nom", (int(dept_id),))
+        fmt_names = dict(zip(formats['id'], formats['nom']))
+        fmt_id = st.selectbox("Spécialité", list(fmt_names), format_func=fmt_names.get)
         
-        if fmt_sel:
+        if fmt_id is not None:
             # Get scheduled exams for this formation
-            fmt_id = formats[formats['nom'] == fmt_sel]['id'].values[0]
-            
-            exams_list = pd.read_sql(f"""
+            exams_list = load_data("""
                 SELECT DISTINCT e.date_examen, m.nom, m.id as mid
                 FROM examens e
                 JOIN modules m ON e.module_id = m.id
-                WHERE m.formation_id = {fmt_id}
+                WHERE m.formation_id = ?
                 ORDER BY e.date_examen
-            """, conn)
+            """, (int(fmt_id),))
             
             if exams_list.empty:
                 st.info("Aucun examen trouvé.")
             else:
-                exam_choice_label = st.selectbox("Choisir l'Examen", 
-                                                 exams_list.apply(lambda x: f"{x['date_examen']} - {x['nom']}", axis=1))
+                exam_labels = (exams_list['date_examen'] + " - " + exams_list['nom']).tolist()
+                exam_idx = st.selectbox("Choisir l'Examen", range(len(exams_list)), format_func=exam_labels.__getitem__)
+                selected = exams_list.iloc[exam_idx]
                 
-                if exam_choice_label:
-                    selected_mid = exams_list[exams_list.apply(lambda x: f"{x['date_examen']} - {x['nom']}", axis=1) == exam_choice_label]['mid'].values[0]
-                    selected_date = exam_choice_label.split(" - ")[0].strip()
-                    
-                    # Show Rooms and Students
-                    room_assignments = pd.read_sql(f"""
-                        SELECT s.nom as Salle, s.capacite, COUNT(ee.etudiant_id) as assigned_count,
-                               e.id as exam_id
-                        FROM examens e
-                        JOIN lieux_examen s ON e.salle_id = s.id
-                        LEFT JOIN examen_etudiants ee ON e.id = ee.examen_id
-                        WHERE e.module_id = {selected_mid} AND e.date_examen = '{selected_date}'
-                        GROUP BY s.nom
-                    """, conn)
-                    
-                    for _, room_row in room_assignments.iterrows():
-                        with st.expander(f"🚪 {room_row['Salle']} ({room_row['assigned_count']} étudiants)"):
-                            students_in_room = pd.read_sql(f"""
-                                SELECT et.nom, et.prenom, et.promo
-                                FROM examen_etudiants ee
-                                JOIN etudiants et ON ee.etudiant_id = et.id
-                                WHERE ee.examen_id = {room_row['exam_id']}
-                                ORDER BY et.nom
-                            """, conn)
-                            st.table(students_in_room)
-    conn.close()
+                # Salles et étudiants de l'examen en une seule requête, regroupés en mémoire
+                seating = load_data("""
+                    SELECT e.id as exam_id, s.nom as "Salle", s.capacite,
+                           et.nom, et.prenom, et.promo
+                    FROM examens e
+                    JOIN lieux_examen s ON e.salle_id = s.id
+                    LEFT JOIN examen_etudiants ee ON e.id = ee.examen_id
+                    LEFT JOIN etudiants et ON ee.etudiant_id = et.id
+                    WHERE e.module_id = ? AND e.date_examen = ?
+                    ORDER BY s.nom, et.nom, et.prenom
+                """, (int(selected['mid']), selected['date_examen']))
+                
+                rooms = seating.groupby('exam_id', sort=False)
+                room_summary = rooms.agg(Salle=('Salle', 'first'), Capacité=('capacite', 'first'),
+                                         Étudiants=('nom', 'count'))
+                st.dataframe(room_summary, use_container_width=True, hide_index=True)
+                
+                # Liste nominative affichée pour la seule salle choisie
+                room_id = st.selectbox("Salle", room_summary.index,
+                                       format_func=lambda rid: f"🚪 {room_summary.at[rid, 'Salle']} ({room_summary.at[rid, 'Étudiants']} étudiants)")
+                if room_id is not None:
+                    students_in_room = rooms.get_group(room_id)[['nom', 'prenom', 'promo']].dropna(subset=['nom'])
+                    st.table(students_in_room.reset_index(drop=True))
     st.markdown('</div>', unsafe_allow_html=True)
 
 
@@ -550,26 +718,25 @@ elif current_page == "Mon Planning" and role == "Étudiant":
     search_name = st.text_input("Rechercher votre Nom", placeholder="Ex: Benali...")
     
     if search_name:
-        students = load_data(f"SELECT id, nom, prenom, promo FROM etudiants WHERE nom LIKE '%{search_name}%' OR prenom LIKE '%{search_name}%' LIMIT 5")
+        students = search_students(search_name)
         
         if not students.empty:
             for _, stu in students.iterrows():
                 with st.expander(f"📅 Planning de {stu['prenom']} {stu['nom']} ({stu['promo']})"):
                     # PRECISE ROOM ASSIGNMENT QUERY
-                    my_exams = load_data(f"""
-                        SELECT m.nom as Module, s.nom as "MA SALLE", e.date_examen, e.creneau_debut
-                        FROM examen_etudiants ee
-                        JOIN examens e ON ee.examen_id = e.id
-                        JOIN modules m ON e.module_id = m.id
-                        JOIN lieux_examen s ON e.salle_id = s.id
-                        WHERE ee.etudiant_id = {stu['id']}
-                        ORDER BY e.date_examen
-                    """)
+                    my_exams = load_data("""
+                        SELECT module_nom as "Module", salle_nom as "MA SALLE", date_examen, creneau_debut
+                        FROM student_timetable
+                        WHERE etudiant_id = ?
+                        ORDER BY date_examen, creneau_debut
+                    """, (int(stu['id']),))
                     
                     if my_exams.empty:
                         st.info("Aucun examen trouvé (ou planning non généré avec affectation).")
                     else:
                         st.table(my_exams)
+                        st.download_button("📅 Ajouter à mon agenda (.ics)", export_bytes("etudiants", "ics", int(stu['id'])),
+                                           f"examens_{stu['id']}.ics", FORMATS["ics"][0], key=f"ics-etu-{stu['id']}")
         else:
             st.warning("Aucun étudiant trouvé.")
             
@@ -589,18 +756,18 @@ elif current_page == "Mes Surveillances" and role == "Professeur":
     if my_name:
         p_id = profs[(profs['nom'] + " " + profs['prenom']) == my_name].iloc[0]['id']
         
-        my_tasks = load_data(f"""
-            SELECT e.date_examen, e.creneau_debut, e.creneau_fin, m.nom as Module, s.nom as Salle
-            FROM examens e
-            JOIN modules m ON e.module_id = m.id
-            JOIN lieux_examen s ON e.salle_id = s.id
-            WHERE e.prof_surveillant_id = {p_id}
-            ORDER BY e.date_examen
-        """)
+        my_tasks = load_data("""
+            SELECT date_examen, creneau_debut, creneau_fin, module_nom as "Module", salle_nom as "Salle"
+            FROM proctor_timetable
+            WHERE prof_id = ?
+            ORDER BY date_examen, creneau_debut
+        """, (int(p_id),))
         
         if my_tasks.empty:
             st.info("Vous n'avez aucune surveillance programmée.")
         else:
             st.dataframe(my_tasks, use_container_width=True)
+            st.download_button("📅 Ajouter à mon agenda (.ics)", export_bytes("surveillants", "ics", int(p_id)),
+                               f"surveillances_{p_id}.ics", FORMATS["ics"][0], key=f"ics-prof-{p_id}")
             
     st.markdown('</div>', unsafe_allow_html=True)
@@ -0,0 +1,182 @@
+# =========================================================================
+# BANC DE PERFORMANCE DU PLANIFICATEUR - UMBB
+# Instances synthétiques paramétrables, temps par phase, résultats en JSON
+# =========================================================================
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+
+from optimizer import ExamScheduler
+from search import name_search_queries
+from seed import init_db, generate_data
+
+# Tailles d'instances (étudiants, profs, salles) ; les variantes "rare" réduisent salles ou surveillants
+SCALES = {
+    "2.5k": dict(num_students=2500, num_profs=200, num_rooms_small=100, num_rooms_large=15),
+    "25k": dict(num_students=25000, num_profs=2000, num_rooms_small=1000, num_rooms_large=150),
+    "25k-salles-rares": dict(num_students=25000, num_profs=2000, num_rooms_small=400, num_rooms_large=60),
+    "25k-profs-rares": dict(num_students=25000, num_profs=500, num_rooms_small=1000, num_rooms_large=150),
+    "250k": dict(num_students=250000, num_profs=20000, num_rooms_small=10000, num_rooms_large=1500),
+}
+
+# Requêtes principales des pages de app.py (paramètres : étudiant, prof, module, date)
+APP_QUERIES = {
+    "dashboard_summary": """
+        SELECT section, label, value FROM dashboard_summary
+    """,
+    "planning_full": """
+        SELECT e.date_examen, e.creneau_debut, e.creneau_fin, m.nom, f.nom, s.nom, p.nom || ' ' || p.prenom
+        FROM examens e
+        JOIN modules m ON e.module_id = m.id
+        JOIN formations f ON m.formation_id = f.id
+        JOIN lieux_examen s ON e.salle_id = s.id
+        LEFT JOIN professeurs p ON e.prof_surveillant_id = p.id
+        ORDER BY e.date_examen, e.creneau_debut
+    """,
+    "repartition_rooms": """
+        SELECT e.id, s.nom, s.capacite, et.nom, et.prenom, et.promo
+        FROM examens e
+        JOIN lieux_examen s ON e.salle_id = s.id
+        LEFT JOIN examen_etudiants ee ON e.id = ee.examen_id
+        LEFT JOIN etudiants et ON ee.etudiant_id = et.id
+        WHERE e.module_id = :module_id AND e.date_examen = :date_examen
+        ORDER BY s.nom, et.nom, et.prenom
+    """,
+    "student_search": """
+        SELECT e.id, e.nom, e.prenom, e.promo
+        FROM etudiants_fts JOIN etudiants e ON e.id = etudiants_fts.rowid
+        WHERE etudiants_fts MATCH :match LIMIT 5
+    """,
+    "student_planning": """
+        SELECT module_nom, salle_nom, date_examen, creneau_debut
+        FROM student_timetable
+        WHERE etudiant_id = :etudiant_id
+        ORDER BY date_examen, creneau_debut
+    """,
+    "proctor_planning": """
+        SELECT date_examen, creneau_debut, creneau_fin, module_nom, salle_nom
+        FROM proctor_timetable
+        WHERE prof_id = :prof_id
+        ORDER BY date_examen, creneau_debut
+    """,
+}
+
+
+def timed(fn, *args, **kwargs):
+    """Exécute fn et retourne (résultat, durée en secondes)."""
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def code_version():
+    """Commit git courant (pour comparer les résultats entre versions), ou None."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_instance(db_path, params, seed=None):
+    """Crée une base synthétique à la taille demandée (reproductible si seed). Retourne la durée de génération."""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    conn = sqlite3.connect(db_path)
+    _, elapsed = timed(lambda: (init_db(conn), generate_data(conn, seed=seed, **params)))
+    conn.close()
+    return elapsed
+
+
+def bench_queries(db_path, repeat):
+    """Temps médian (ms) de chaque requête des pages de l'application."""
+    conn = sqlite3.connect(db_path)
+    sample = conn.execute("SELECT module_id, date_examen, prof_surveillant_id FROM examens LIMIT 1").fetchone()
+    student = conn.execute("SELECT id, nom FROM etudiants LIMIT 1").fetchone()
+    if sample is None or student is None:
+        conn.close()
+        return {}
+    params = {'module_id': sample[0], 'date_examen': sample[1], 'prof_id': sample[2],
+              'etudiant_id': student[0], 'match': name_search_queries(student[1][:4])[-1]}
+
+    results = {}
+    for name, sql in APP_QUERIES.items():
+        durations = [timed(lambda: conn.execute(sql, params).fetchall())[1] for _ in range(repeat)]
+        results[name] = round(statistics.median(durations) * 1000, 3)
+    conn.close()
+    return results
+
+
+def run_scale(name, params, workdir, days, mode, repeat, seed=None):
+    """
+    Mesure une instance : génération des données, get_data (chargement complet puis depuis l'instantané),
+    generate_schedule, save, requêtes.
+    """
+    db_path = os.path.join(workdir, f"bench_{name}.db")
+    print(f"[{name}] Génération de l'instance ({params['num_students']} étudiants)...")
+    seed_s = build_instance(db_path, params, seed)
+
+    # Dossier d'instantanés propre à la mesure : le premier get_data recalcule toujours le problème
+    snapshot_dir = tempfile.mkdtemp(prefix=f"snapshots_{name}_", dir=workdir)
+    scheduler = ExamScheduler(db_path, snapshot_dir=snapshot_dir)
+    _, get_data_s = timed(scheduler.get_data)
+    _, get_data_snapshot_s = timed(scheduler.get_data)
+
+    start = datetime.date(2026, 1, 4)
+    n_exams, generate_s = timed(scheduler.generate_schedule, start, start + datetime.timedelta(days=days - 1), mode=mode)
+    save_stats = scheduler.last_save_stats
+    scheduler.conn.close()
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+    record = {
+        'scale': name,
+        'params': params,
+        'seed': seed,
+        'mode': mode,
+        'days': days,
+        'timings_s': {
+            'seed': round(seed_s, 3),
+            'get_data': round(get_data_s, 3),
+            'get_data_snapshot': round(get_data_snapshot_s, 3),
+            'generate_schedule': round(generate_s - save_stats['seconds'], 3),  # Hors sauvegarde (mesurée à part)
+            'save': round(save_stats['seconds'], 3),
+        },
+        'save_rows_per_sec': round(save_stats['rows_per_sec']),
+        'generation_stats': scheduler.stats.to_dict(),
+        'exams': n_exams,
+        'unscheduled_modules': len(scheduler.unscheduled),
+        'app_queries_ms': bench_queries(db_path, repeat),
+    }
+    print(f"[{name}] {json.dumps(record['timings_s'])}")
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc de performance du planificateur d'examens")
+    parser.add_argument("--scales", nargs="+", default=["2.5k", "25k"], choices=list(SCALES))
+    parser.add_argument("--mode", default="greedy", help="Mode de planification (greedy, dsatur...)")
+    parser.add_argument("--days", type=int, default=21, help="Durée de la session d'examens (jours)")
+    parser.add_argument("--repeat", type=int, default=5, help="Répétitions par requête applicative")
+    parser.add_argument("--workdir", default=tempfile.gettempdir(), help="Dossier des bases synthétiques")
+    parser.add_argument("--seed", type=int, default=0, help="Graine des données synthétiques (instances identiques entre versions)")
+    parser.add_argument("--output", default="benchmark_results.jsonl", help="Fichier de résultats (JSON Lines, ajout)")
+    args = parser.parse_args()
+
+    run = {'timestamp': datetime.datetime.now().isoformat(timespec='seconds'), 'version': code_version()}
+    with open(args.output, "a", encoding="utf-8") as out:
+        for name in args.scales:
+            record = dict(run, **run_scale(name, SCALES[name], args.workdir, args.days, args.mode, args.repeat, args.seed))
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    print(f"Résultats ajoutés à {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# =========================================================================
+# CONVOCATIONS EN MASSE - UMBB
+# Convocations étudiants et fiches de surveillance (HTML + ICS), rendues en parallèle
+# par tranches d'IDs, archivées en ZIP ; reprise possible après interruption
+# =========================================================================
+
+import argparse
+import concurrent.futures
+import html
+import io
+import itertools
+import json
+import os
+import shutil
+import time
+import zipfile
+
+from export import EXPORTS, write_ics
+from optimizer import schedule_generation
+from storage import DATABASE_URL, open_storage
+
+CONVOCATION_RANGE = 2000  # IDs (étudiants ou professeurs) par tranche de rendu
+
+# Documents par population : table des personnes, requête d'une tranche d'IDs, colonnes ICS
+CONVOCATIONS = {
+    "etudiants": {
+        "people": "etudiants",
+        "sql": """
+            SELECT t.examen_id, t.date_examen, t.creneau_debut, t.creneau_fin, t.module_nom, t.salle_nom,
+                   et.id, et.nom, et.prenom, f.nom, et.promo
+            FROM student_timetable t
+            JOIN etudiants et ON et.id = t.etudiant_id
+            LEFT JOIN formations f ON f.id = et.formation_id
+            WHERE t.etudiant_id BETWEEN ? AND ?
+            ORDER BY t.etudiant_id, t.date_examen, t.creneau_debut
+        """,
+        "ics_columns": EXPORTS["etudiants"]["columns"],
+        "title": "Convocation aux examens",
+    },
+    "surveillants": {
+        "people": "professeurs",
+        "sql": """
+            SELECT t.examen_id, t.date_examen, t.creneau_debut, t.creneau_fin, t.module_nom, t.salle_nom,
+                   p.id, p.nom, p.prenom, d.nom,
+                   (SELECT COUNT(*) FROM examen_etudiants ee WHERE ee.examen_id = t.examen_id)
+            FROM proctor_timetable t
+            JOIN professeurs p ON p.id = t.prof_id
+            LEFT JOIN departements d ON d.id = p.dept_id
+            WHERE t.prof_id BETWEEN ? AND ?
+            ORDER BY t.prof_id, t.date_examen, t.creneau_debut
+        """,
+        "ics_columns": EXPORTS["surveillants"]["columns"],
+        "title": "Fiche de surveillance",
+    },
+}
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="fr">
+<head><meta charset="utf-8"><title>{title} - {name}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2rem; color: #1e1b4b; }}
+table {{ border-collapse: collapse; width: 100%; }}
+th, td {{ border: 1px solid #e2e8f0; padding: .4rem .6rem; text-align: left; }}
+th {{ background: #f1f5f9; }}
+</style></head>
+<body>
+<h1>{title}</h1>
+<p><strong>{name}</strong> &mdash; {affiliation}</p>
+<table>
+<tr>{header}</tr>
+{rows}
+</table>
+</body>
+</html>
+"""
+
+
+def render_html(kind, person, exams):
+    """Convocation (étudiant) ou fiche de surveillance (professeur) au format HTML."""
+    _, nom, prenom, affiliation = person[:4]
+    header = ["Date", "Créneau", "Module", "Salle"] + (["Étudiants"] if kind == "surveillants" else [])
+    rows = []
+    for r in exams:
+        cells = [r[1], f"{r[2]} - {r[3]}", r[4], r[5]] + ([r[10]] if kind == "surveillants" else [])
+        rows.append("<tr>" + "".join(f"<td>{html.escape(str(c))}</td>" for c in cells) + "</tr>")
+    return HTML_TEMPLATE.format(title=CONVOCATIONS[kind]["title"], name=html.escape(f"{prenom} {nom}"),
+                                affiliation=html.escape(affiliation or ""),
+                                header="".join(f"<th>{h}</th>" for h in header), rows="\n".join(rows))
+
+
+def render_range(task):
+    """
+    Rend les documents d'une tranche d'IDs dans une archive partielle (écriture atomique).
+    Exécuté dans un processus de calcul : connexion en lecture seule propre à la tâche.
+    """
+    db_path, kind, lo, hi, part_path = task
+    spec = CONVOCATIONS[kind]
+    storage = open_storage(db_path)
+    conn = storage.connect(readonly=True)
+    rows = [r for chunk in storage.iter_rows(conn, spec["sql"], (lo, hi)) for r in chunk]
+    conn.close()
+
+    n_docs = 0
+    tmp_path = part_path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as part:
+        for person_id, exams in itertools.groupby(rows, key=lambda r: r[6]):
+            exams = list(exams)
+            person = exams[0][6:10]
+            part.writestr(f"{kind}/{person_id}.html", render_html(kind, person, exams))
+            ics = io.StringIO()
+            write_ics([[r[:len(spec["ics_columns"])] for r in exams]], spec["ics_columns"], ics,
+                      calendar_name=f"{spec['title']} - {person[2]} {person[1]}")
+            part.writestr(f"{kind}/{person_id}.ics", ics.getvalue())
+            n_docs += 1
+    os.replace(tmp_path, part_path)
+    return n_docs
+
+
+def id_ranges(conn, table, range_size=CONVOCATION_RANGE):
+    """Tranches [lo, hi] couvrant les IDs de la table."""
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT MIN(id), MAX(id) FROM {table}")
+    lo, hi = cursor.fetchone()
+    cursor.close()
+    if lo is None:
+        return []
+    return [(start, min(start + range_size - 1, hi)) for start in range(lo, hi + 1, range_size)]
+
+
+def _read_manifest(path):
+    """Contenu du manifeste des parties (None s'il est absent ou illisible)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def generate_convocations(db_path, output, kinds=tuple(CONVOCATIONS), range_size=CONVOCATION_RANGE, workers=None):
+    """
+    Rend toutes les convocations dans l'archive ZIP `output`.
+    Les tranches sont rendues en parallèle dans `<output>.parts/` ; une tranche déjà présente
+    (exécution interrompue) n'est pas recalculée. Le manifeste des parties (base, génération du planning,
+    taille des tranches) doit correspondre à l'exécution en cours : sinon les parties sont écartées.
+    Les parties sont fusionnées puis supprimées. Retourne le nombre de personnes convoquées rendues lors de cet appel.
+    """
+    storage = open_storage(db_path)
+    conn = storage.connect(readonly=True)
+    manifest = {"base": storage.location, "generation": schedule_generation(conn), "range_size": range_size}
+
+    parts_dir = output + ".parts"
+    manifest_path = os.path.join(parts_dir, "manifest.json")
+    if os.path.isdir(parts_dir) and _read_manifest(manifest_path) != manifest:
+        print("Convocations : parties d'une exécution antérieure (autre planning ou autres tranches) écartées")
+        shutil.rmtree(parts_dir)
+    os.makedirs(parts_dir, exist_ok=True)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    parts, tasks = [], []
+    for kind in kinds:
+        for lo, hi in id_ranges(conn, CONVOCATIONS[kind]["people"], range_size):
+            part_path = os.path.join(parts_dir, f"{kind}_{lo:08d}_{hi:08d}.zip")
+            parts.append(part_path)
+            if not os.path.exists(part_path):
+                tasks.append((db_path, kind, lo, hi, part_path))
+    conn.close()
+
+    t0 = time.perf_counter()
+    n_docs = 0
+    print(f"Convocations : {len(tasks)} tranche(s) à rendre, {len(parts) - len(tasks)} déjà prête(s)")
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        for done, count in enumerate(pool.map(render_range, tasks), 1):
+            n_docs += count
+            print(f"  {done}/{len(tasks)} tranches ({n_docs} personnes)", end="\r")
+
+    # Planning régénéré pendant le rendu : les parties mélangeraient deux plannings
+    conn = storage.connect(readonly=True)
+    generation = schedule_generation(conn)
+    conn.close()
+    if generation != manifest["generation"]:
+        shutil.rmtree(parts_dir)
+        raise RuntimeError("Le planning a été régénéré pendant le rendu des convocations : relancer la commande")
+
+    # Fusion des parties attendues dans l'archive finale (écriture atomique), puis nettoyage
+    tmp_output = output + ".tmp"
+    with zipfile.ZipFile(tmp_output, "w", zipfile.ZIP_DEFLATED) as archive:
+        for part_path in parts:
+            with zipfile.ZipFile(part_path) as part:
+                for info in part.infolist():
+                    archive.writestr(info, part.read(info), compress_type=zipfile.ZIP_DEFLATED)
+    os.replace(tmp_output, output)
+    shutil.rmtree(parts_dir)
+    print(f"\nConvocations : {n_docs} personnes rendues en {time.perf_counter() - t0:.1f}s -> {output}")
+    return n_docs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère les convocations (HTML + ICS) de tous les étudiants et surveillants")
+    parser.add_argument("-o", "--output", default="convocations.zip", help="Archive ZIP produite")
+    parser.add_argument("--db", default=DATABASE_URL, help="Base : chemin SQLite ou URL (défaut $DATABASE_URL)")
+    parser.add_argument("--kinds", nargs="+", default=list(CONVOCATIONS), choices=list(CONVOCATIONS))
+    parser.add_argument("--range-size", type=int, default=CONVOCATION_RANGE, help="IDs par tranche de rendu")
+    parser.add_argument("--workers", type=int, default=None, help="Processus de rendu (défaut : nombre de CPU)")
+    args = parser.parse_args()
+    generate_convocations(args.db, args.output, tuple(args.kinds), args.range_size, args.workers)
+
+
+if __name__ == "__main__":
+    main()
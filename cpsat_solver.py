@@ -0,0 +1,155 @@
+# =========================================================================
+# SOLVEUR CP-SAT (OR-TOOLS) - UMBB
+# Backend optionnel : modèle par contraintes amorcé par la solution gloutonne
+# =========================================================================
+
+import datetime
+import os
+
+from optimizer import ExamScheduler, ScheduleStats, amphis_first_strategy
+
+try:
+    from ortools.sat.python import cp_model
+except ImportError:  # ortools est optionnel : seul ce backend en dépend
+    cp_model = None
+
+CPSAT_AVAILABLE = cp_model is not None
+
+
+class CPSatScheduler(ExamScheduler):
+    """
+    Planification par programmation par contraintes (CP-SAT).
+    Le modèle choisit un (jour, créneau) par module ; les salles et surveillants nominatifs
+    sont ensuite affectés par les mêmes index que le glouton, puis sauvegardés via save().
+    """
+    def __init__(self, db_path, time_limit=30.0, workers=None, room_strategy=amphis_first_strategy):
+        if not CPSAT_AVAILABLE:
+            raise ImportError("Le solveur CP-SAT nécessite ortools (pip install ortools)")
+        super().__init__(db_path, room_strategy)
+        self.time_limit = time_limit                   # Limite de temps du solveur (secondes)
+        self.workers = workers or os.cpu_count() or 1  # Nombre de threads de recherche
+
+    def generate_schedule(self, start_date, end_date, formation_ids=None, append=False, mode="cpsat", **kwargs):
+        """Identique à ExamScheduler.generate_schedule, avec le mode "cpsat" par défaut."""
+        return super().generate_schedule(start_date, end_date, formation_ids, append, mode, **kwargs)
+
+    def _multi_start(self, mode, mids, n_starts, workers=None):
+        """Départs multiples : les threads de recherche CP-SAT sont répartis entre les processus parallèles."""
+        processes = min(workers or os.cpu_count() or 1, n_starts)
+        threads = self.workers
+        self.workers = max(1, threads // processes)
+        try:
+            return super()._multi_start(mode, mids, n_starts, workers)
+        finally:
+            self.workers = threads
+
+    def _iter_cpsat(self, mids):
+        """Solution gloutonne (indice), résolution CP-SAT, puis affectation nominative module par module."""
+        # 1. Solution gloutonne utilisée comme indice (warm start), puis remise à zéro des trackers
+        #    (instrumentée à part : seule sa durée totale est reportée ; modules non placés non signalés)
+        stats, self.stats = self.stats, ScheduleStats()
+        quiet, self.quiet = self.quiet, True
+        hint = {}
+        try:
+            for e in self._schedule("greedy", mids):
+                day_off = (datetime.date.fromisoformat(e['date_examen']) - self.start_date).days
+                hint[e['module_id']] = (day_off, [s[0] for s in self.SLOTS].index(e['creneau_debut']))
+        finally:
+            self.quiet = quiet
+        stats.phases["amorce_glouton"] = sum(self.stats.phases.values())
+        self.stats = stats
+        self._init_trackers()
+
+        # 2. Modèle et résolution
+        with self.stats.phase("cpsat"):
+            assignment = self._solve(mids, hint)
+
+        # 3. Affectation nominative (salles, surveillants, étudiants) sur les créneaux retenus
+        for mid in sorted(mids, key=lambda x: self.priority[x], reverse=True):
+            entries = None
+            if mid in assignment:
+                d, s = assignment[mid]
+                if self.cohort_days.is_free(d, self.module_cohorts[mid]):
+                    entries = self._place_module(mid, d, slots=[self.SLOTS[s]])
+            if not entries:
+                # Le modèle agrège les salles : repli sur le premier jour faisable si le découpage échoue
+                _, entries = self._place_first_day(mid)
+            if not entries:
+                self._warn_unscheduled(mid)
+            yield mid, entries
+
+    def _solve(self, mids, hint):
+        """
+        Contraintes modélisées :
+          - un (jour, créneau) au plus par module,
+          - capacité des salles par créneau (places et nombre de salles),
+          - 1 examen/jour/étudiant (par cohorte),
+          - Max 3 surveillances/jour/prof (une surveillance par salle occupée).
+        Objectif : maximiser les modules planifiés, puis minimiser les jours utilisés.
+        Retourne {module: (jour, créneau)} ; l'indice glouton si le solveur ne trouve rien.
+        """
+        days = range(self.delta_days)
+        slots = range(len(self.SLOTS))
+
+        # Nombre de salles nécessaires par module (None : plus grand que toutes les salles réunies)
+        need = {mid: self.free_rooms.rooms_needed(self.module_counts[mid]) for mid in mids}
+        plannable = [mid for mid in mids if need[mid] is not None]
+        dates = [str(self.start_date + datetime.timedelta(days=d)) for d in days]
+
+        model = cp_model.CpModel()
+        x = {(mid, d, s): model.NewBoolVar(f"x_{mid}_{d}_{s}") for mid in plannable for d in days for s in slots}
+        placed = {mid: model.NewBoolVar(f"placed_{mid}") for mid in plannable}
+        used = [model.NewBoolVar(f"day_{d}") for d in days]
+
+        for mid in plannable:
+            model.Add(sum(x[mid, d, s] for d in days for s in slots) == placed[mid])
+            # Jours déjà pris par les cohortes du module (examens existants en mode incrémental)
+            for d in days:
+                if not self.cohort_days.is_free(d, self.module_cohorts[mid]):
+                    for s in slots:
+                        model.Add(x[mid, d, s] == 0)
+
+        # Capacité des salles libres par créneau
+        for d in days:
+            for s in slots:
+                free_seats, free_rooms = self.free_rooms.free_capacity(dates[d], self.SLOTS[s][0])
+                model.Add(sum(self.module_counts[mid] * x[mid, d, s] for mid in plannable) <= free_seats)
+                model.Add(sum(need[mid] * x[mid, d, s] for mid in plannable) <= free_rooms)
+
+        # 1 examen/jour/étudiant : les modules d'une même cohorte occupent des jours distincts
+        for c_modules in self.cohort_modules:
+            c_mids = [mid for mid in c_modules if mid in placed]
+            if len(c_mids) < 2:
+                continue
+            for d in days:
+                model.AddAtMostOne(x[mid, d, s] for mid in c_mids for s in slots)
+
+        # Max 3 surveillances/jour/prof : au plus les surveillances encore disponibles du jour
+        for d in days:
+            model.Add(sum(need[mid] * x[mid, d, s] for mid in plannable for s in slots)
+                      <= self.proctors.remaining(dates[d]))
+
+        # Jours utilisés (tassement de la session)
+        for (mid, d, s), var in x.items():
+            model.AddImplication(var, used[d])
+        model.Maximize((self.delta_days + 1) * sum(placed.values()) - sum(used))
+
+        # Indice issu du glouton
+        hint_days = {d for d, _ in hint.values()}
+        for (mid, d, s), var in x.items():
+            model.AddHint(var, hint.get(mid) == (d, s))
+        for mid, var in placed.items():
+            model.AddHint(var, mid in hint)
+        for d in days:
+            model.AddHint(used[d], d in hint_days)
+
+        # Résolution
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = self.time_limit
+        solver.parameters.num_search_workers = self.workers
+        status = solver.Solve(model)
+
+        if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return {mid: (d, s) for (mid, d, s), var in x.items() if solver.Value(var)}
+        print(f"WARNING: CP-SAT sans solution ({solver.StatusName(status)}), repli sur le glouton")
+        return hint
@@ -0,0 +1,219 @@
+# =========================================================================
+# EXPORT DES PLANNINGS - UMBB
+# Lecture par paquets (curseur) et écriture au fil de l'eau : CSV, Parquet, iCalendar
+# =========================================================================
+
+import argparse
+import csv
+import datetime
+
+from storage import DATABASE_URL, SQLiteStorage, open_storage
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow est optionnel : seul le format Parquet en dépend
+    pa = None
+
+PARQUET_AVAILABLE = pa is not None
+
+EXPORT_CHUNK_SIZE = 5000  # Lignes lues par paquet (fetchmany, curseur serveur sur PostgreSQL)
+ICS_PRODID = "-//UMBB//Planification des examens//FR"
+
+# Exports disponibles : requête, colonnes (nom, type) et colonne de filtre (spécialité, salle ou personne).
+# Toutes exposent examen_id, date_examen, creneau_debut, creneau_fin, module et salle (événements iCalendar).
+EXPORTS = {
+    # Planning complet : une ligne par salle d'examen
+    "planning": {
+        "sql": """
+            SELECT e.id, e.date_examen, e.creneau_debut, e.creneau_fin, m.nom, f.nom, s.nom,
+                   p.nom || ' ' || p.prenom
+            FROM examens e
+            JOIN modules m ON e.module_id = m.id
+            JOIN formations f ON m.formation_id = f.id
+            JOIN lieux_examen s ON e.salle_id = s.id
+            LEFT JOIN professeurs p ON e.prof_surveillant_id = p.id
+            {where}
+            ORDER BY e.date_examen, e.creneau_debut, m.nom, s.nom
+        """,
+        "columns": [("examen_id", "int"), ("date_examen", "str"), ("creneau_debut", "str"), ("creneau_fin", "str"),
+                    ("module", "str"), ("specialite", "str"), ("salle", "str"), ("surveillant", "str")],
+        "filter": "m.formation_id",
+    },
+    # Feuilles d'émargement : liste nominative par salle d'examen
+    "salles": {
+        "sql": """
+            SELECT e.id, e.date_examen, e.creneau_debut, e.creneau_fin, m.nom, s.nom,
+                   et.id, et.nom, et.prenom, et.promo
+            FROM examens e
+            JOIN modules m ON e.module_id = m.id
+            JOIN lieux_examen s ON e.salle_id = s.id
+            JOIN examen_etudiants ee ON ee.examen_id = e.id
+            JOIN etudiants et ON et.id = ee.etudiant_id
+            {where}
+            ORDER BY e.date_examen, e.creneau_debut, s.nom, et.nom, et.prenom
+        """,
+        "columns": [("examen_id", "int"), ("date_examen", "str"), ("creneau_debut", "str"), ("creneau_fin", "str"),
+                    ("module", "str"), ("salle", "str"), ("etudiant_id", "int"), ("nom", "str"), ("prenom", "str"),
+                    ("promo", "str")],
+        "filter": "e.salle_id",
+    },
+    # Calendriers des étudiants (emploi du temps matérialisé)
+    "etudiants": {
+        "sql": """
+            SELECT t.examen_id, t.date_examen, t.creneau_debut, t.creneau_fin, t.module_nom, t.salle_nom,
+                   et.id, et.nom, et.prenom
+            FROM student_timetable t
+            JOIN etudiants et ON et.id = t.etudiant_id
+            {where}
+            ORDER BY t.etudiant_id, t.date_examen, t.creneau_debut
+        """,
+        "columns": [("examen_id", "int"), ("date_examen", "str"), ("creneau_debut", "str"), ("creneau_fin", "str"),
+                    ("module", "str"), ("salle", "str"), ("etudiant_id", "int"), ("nom", "str"), ("prenom", "str")],
+        "filter": "t.etudiant_id",
+    },
+    # Calendriers des surveillants
+    "surveillants": {
+        "sql": """
+            SELECT t.examen_id, t.date_examen, t.creneau_debut, t.creneau_fin, t.module_nom, t.salle_nom,
+                   p.id, p.nom, p.prenom
+            FROM proctor_timetable t
+            JOIN professeurs p ON p.id = t.prof_id
+            {where}
+            ORDER BY t.prof_id, t.date_examen, t.creneau_debut
+        """,
+        "columns": [("examen_id", "int"), ("date_examen", "str"), ("creneau_debut", "str"), ("creneau_fin", "str"),
+                    ("module", "str"), ("salle", "str"), ("prof_id", "int"), ("nom", "str"), ("prenom", "str")],
+        "filter": "t.prof_id",
+    },
+}
+
+FORMATS = {"csv": ("text/csv", "csv"), "parquet": ("application/vnd.apache.parquet", "parquet"),
+           "ics": ("text/calendar", "ics")}
+
+
+def iter_chunks(conn, kind, filter_id=None, chunk_size=EXPORT_CHUNK_SIZE, storage=None):
+    """Lignes de l'export `kind` par paquets de chunk_size (restreintes à filter_id si fourni)."""
+    spec = EXPORTS[kind]
+    where, params = "", ()
+    if filter_id is not None:
+        where, params = f"WHERE {spec['filter']} = ?", (filter_id,)
+    storage = storage or SQLiteStorage()
+    return storage.iter_rows(conn, spec["sql"].format(where=where), params, chunk_size)
+
+
+def write_csv(chunks, columns, out):
+    """CSV (séparateur virgule, en-tête) vers un fichier texte ouvert."""
+    writer = csv.writer(out)
+    writer.writerow([name for name, _ in columns])
+    n_rows = 0
+    for rows in chunks:
+        writer.writerows(rows)
+        n_rows += len(rows)
+    return n_rows
+
+
+def write_parquet(chunks, columns, path):
+    """Parquet : un groupe de lignes par paquet, schéma fixé par la définition de l'export."""
+    if not PARQUET_AVAILABLE:
+        raise ImportError("L'export Parquet nécessite pyarrow (pip install pyarrow)")
+    schema = pa.schema([(name, pa.int64() if kind == "int" else pa.string()) for name, kind in columns])
+    n_rows = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            arrays = [pa.array([r[i] for r in rows], type=field.type) for i, field in enumerate(schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            n_rows += len(rows)
+    return n_rows
+
+
+def _ics_text(value):
+    """Échappement des valeurs texte iCalendar (RFC 5545)."""
+    return str(value).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _ics_line(line):
+    """Ligne terminée par CRLF, repliée à 75 octets."""
+    data = line.encode("utf-8")
+    parts = []
+    while len(data) > 75:
+        cut = 75 if not parts else 74
+        while data[cut] & 0xC0 == 0x80:  # Ne pas couper un caractère UTF-8
+            cut -= 1
+        parts.append(data[:cut])
+        data = data[cut:]
+    parts.append(data)
+    return b"\r\n ".join(parts).decode("utf-8") + "\r\n"
+
+
+def write_ics(chunks, columns, out, calendar_name="Examens UMBB"):
+    """iCalendar : un événement par ligne (heures locales), UID stable par examen et personne."""
+    names = [name for name, _ in columns]
+    idx = {name: names.index(name) for name in names}
+    owner = next((prefix for name, prefix in (("etudiant_id", "etu"), ("prof_id", "prof")) if name in idx), None)
+    owner_idx = idx.get("etudiant_id", idx.get("prof_id"))
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    for line in ("BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{ICS_PRODID}", "CALSCALE:GREGORIAN",
+                 f"X-WR-CALNAME:{_ics_text(calendar_name)}"):
+        out.write(_ics_line(line))
+    n_rows = 0
+    for rows in chunks:
+        for r in rows:
+            day = r[idx["date_examen"]].replace("-", "")
+            uid = f"examen-{r[idx['examen_id']]}" + (f"-{owner}-{r[owner_idx]}" if owner else "")
+            for line in ("BEGIN:VEVENT",
+                         f"UID:{uid}@umbb-sched",
+                         f"DTSTAMP:{stamp}",
+                         f"DTSTART:{day}T{r[idx['creneau_debut']].replace(':', '')}00",
+                         f"DTEND:{day}T{r[idx['creneau_fin']].replace(':', '')}00",
+                         f"SUMMARY:{_ics_text('Examen : ' + r[idx['module']])}",
+                         f"LOCATION:{_ics_text(r[idx['salle']])}",
+                         "END:VEVENT"):
+                out.write(_ics_line(line))
+        n_rows += len(rows)
+    out.write(_ics_line("END:VCALENDAR"))
+    return n_rows
+
+
+def export(conn, kind, fmt, path, filter_id=None, chunk_size=EXPORT_CHUNK_SIZE, storage=None):
+    """
+    Écrit l'export `kind` ("planning", "salles", "etudiants", "surveillants") au format fmt
+    ("csv", "parquet", "ics") dans path, paquet par paquet. Retourne le nombre de lignes écrites.
+    filter_id : restreint à une spécialité (planning), une salle (salles), un étudiant ou un surveillant.
+    storage : stockage de la connexion (défaut SQLite ; curseur serveur sur PostgreSQL).
+    """
+    columns = EXPORTS[kind]["columns"]
+    chunks = iter_chunks(conn, kind, filter_id, chunk_size, storage)
+    if fmt == "parquet":
+        return write_parquet(chunks, columns, path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Format d'export inconnu : {fmt}")
+    # newline="" : le module csv et les lignes iCalendar gèrent eux-mêmes les fins de ligne
+    with open(path, "w", encoding="utf-8", newline="") as out:
+        if fmt == "csv":
+            return write_csv(chunks, columns, out)
+        return write_ics(chunks, columns, out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export des plannings d'examens (CSV, Parquet, iCalendar)")
+    parser.add_argument("kind", choices=list(EXPORTS), help="Contenu exporté")
+    parser.add_argument("format", choices=list(FORMATS), help="Format du fichier")
+    parser.add_argument("-o", "--output", help="Fichier de sortie (défaut : <contenu>[_<id>].<format>)")
+    parser.add_argument("--id", type=int, default=None,
+                        help="Restreindre à une spécialité (planning), une salle (salles), un étudiant ou un surveillant")
+    parser.add_argument("--db", default=DATABASE_URL, help="Base : chemin SQLite ou URL (défaut $DATABASE_URL)")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="Lignes lues par paquet")
+    args = parser.parse_args()
+
+    output = args.output or f"{args.kind}{'' if args.id is None else f'_{args.id}'}.{FORMATS[args.format][1]}"
+    storage = open_storage(args.db)
+    conn = storage.connect(readonly=True)
+    n_rows = export(conn, args.kind, args.format, output, args.id, args.chunk_size, storage)
+    conn.close()
+    print(f"{n_rows} lignes exportées dans {output}")
+
+
+if __name__ == "__main__":
+    main()
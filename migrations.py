@@ -0,0 +1,237 @@
+# =========================================================================
+# MIGRATIONS DU SCHEMA SQLITE - UMBB
+# Mise à niveau en place du schéma (PRAGMA user_version), sans perte de données
+# =========================================================================
+
+import sqlite3
+
+
+# v1 : tables d'origine (sans effet sur une base existante)
+CREATE_BASE_TABLES = """
+    CREATE TABLE IF NOT EXISTS departements (id INTEGER PRIMARY KEY, nom TEXT);
+    CREATE TABLE IF NOT EXISTS formations (id INTEGER PRIMARY KEY, nom TEXT, dept_id INTEGER);
+    CREATE TABLE IF NOT EXISTS professeurs (id INTEGER PRIMARY KEY, nom TEXT, prenom TEXT, dept_id INTEGER);
+    CREATE TABLE IF NOT EXISTS etudiants (id INTEGER PRIMARY KEY, nom TEXT, prenom TEXT, formation_id INTEGER, promo TEXT);
+    CREATE TABLE IF NOT EXISTS modules (id INTEGER PRIMARY KEY, nom TEXT, credits INTEGER, formation_id INTEGER, sem INTEGER);
+    CREATE TABLE IF NOT EXISTS lieux_examen (id INTEGER PRIMARY KEY, nom TEXT, capacite INTEGER, type TEXT);
+    CREATE TABLE IF NOT EXISTS inscriptions (etudiant_id INTEGER, module_id INTEGER, note REAL);
+    CREATE TABLE IF NOT EXISTS examens (
+        id INTEGER PRIMARY KEY,
+        module_id INTEGER,
+        prof_surveillant_id INTEGER,
+        salle_id INTEGER,
+        date_examen TEXT,
+        creneau_debut TEXT,
+        creneau_fin TEXT
+    );
+    CREATE TABLE IF NOT EXISTS examen_etudiants (
+        examen_id INTEGER,
+        etudiant_id INTEGER,
+        seat_number INTEGER,
+        PRIMARY KEY (examen_id, etudiant_id)
+    );
+"""
+
+# v2 : clé primaire (etudiant_id, module_id) sur inscriptions (doublons éventuels fusionnés)
+INSCRIPTIONS_PRIMARY_KEY = """
+    CREATE TABLE inscriptions_v2 (
+        etudiant_id INTEGER,
+        module_id INTEGER,
+        note REAL,
+        PRIMARY KEY (etudiant_id, module_id)
+    );
+    INSERT OR IGNORE INTO inscriptions_v2 (etudiant_id, module_id, note)
+        SELECT etudiant_id, module_id, note FROM inscriptions ORDER BY etudiant_id, module_id;
+    DROP TABLE inscriptions;
+    ALTER TABLE inscriptions_v2 RENAME TO inscriptions;
+"""
+
+# v3 : index des recherches de l'application et du planificateur (dont ceux de schema.sql)
+CREATE_INDEXES = """
+    CREATE INDEX IF NOT EXISTS idx_examens_date_creneau ON examens(date_examen, creneau_debut, creneau_fin);
+    CREATE INDEX IF NOT EXISTS idx_inscriptions_module ON inscriptions(module_id);
+    CREATE INDEX IF NOT EXISTS idx_etudiants_formation ON etudiants(formation_id);
+    CREATE INDEX IF NOT EXISTS idx_modules_formation ON modules(formation_id);
+    CREATE INDEX IF NOT EXISTS idx_examens_module ON examens(module_id);
+    CREATE INDEX IF NOT EXISTS idx_examens_prof ON examens(prof_surveillant_id);
+    CREATE INDEX IF NOT EXISTS idx_examen_etudiants_etudiant ON examen_etudiants(etudiant_id);
+"""
+
+# v4 : compteur de générations du planning (incrémenté à chaque sauvegarde, clé des caches de l'application)
+SCHEDULE_GENERATION = """
+    CREATE TABLE IF NOT EXISTS schedule_meta (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        generation INTEGER NOT NULL DEFAULT 0
+    );
+    INSERT OR IGNORE INTO schedule_meta (id, generation) VALUES (1, 0);
+"""
+
+# v5 : index plein texte des noms d'étudiants (FTS5 à contenu externe, tenu à jour par triggers)
+STUDENT_FTS_TRIGGERS = {
+    "etudiants_fts_ai": """CREATE TRIGGER IF NOT EXISTS etudiants_fts_ai AFTER INSERT ON etudiants BEGIN
+        INSERT INTO etudiants_fts(rowid, nom, prenom) VALUES (new.id, new.nom, new.prenom);
+    END""",
+    "etudiants_fts_ad": """CREATE TRIGGER IF NOT EXISTS etudiants_fts_ad AFTER DELETE ON etudiants BEGIN
+        INSERT INTO etudiants_fts(etudiants_fts, rowid, nom, prenom) VALUES ('delete', old.id, old.nom, old.prenom);
+    END""",
+    "etudiants_fts_au": """CREATE TRIGGER IF NOT EXISTS etudiants_fts_au AFTER UPDATE OF nom, prenom ON etudiants BEGIN
+        INSERT INTO etudiants_fts(etudiants_fts, rowid, nom, prenom) VALUES ('delete', old.id, old.nom, old.prenom);
+        INSERT INTO etudiants_fts(rowid, nom, prenom) VALUES (new.id, new.nom, new.prenom);
+    END""",
+}
+STUDENT_NAME_INDEX = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS etudiants_fts USING fts5(
+        nom, prenom,
+        content='etudiants', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='1 2 3'
+    );
+    INSERT INTO etudiants_fts(etudiants_fts) VALUES ('rebuild');
+""" + "".join(f"    {sql};\n" for sql in STUDENT_FTS_TRIGGERS.values())
+
+# v6 : emplois du temps dénormalisés (un examen par ligne, clé = personne puis date) pour
+#      "Mon Planning" et "Mes Surveillances" ; réécrits par ExamScheduler.save, remplis ici depuis l'existant
+TIMETABLES = """
+    CREATE TABLE IF NOT EXISTS student_timetable (
+        etudiant_id INTEGER,
+        date_examen TEXT,
+        creneau_debut TEXT,
+        creneau_fin TEXT,
+        examen_id INTEGER,
+        module_id INTEGER,
+        module_nom TEXT,
+        salle_nom TEXT,
+        PRIMARY KEY (etudiant_id, date_examen, creneau_debut, examen_id)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS proctor_timetable (
+        prof_id INTEGER,
+        date_examen TEXT,
+        creneau_debut TEXT,
+        creneau_fin TEXT,
+        examen_id INTEGER,
+        module_id INTEGER,
+        module_nom TEXT,
+        salle_nom TEXT,
+        PRIMARY KEY (prof_id, date_examen, creneau_debut, examen_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_student_timetable_module ON student_timetable(module_id);
+    CREATE INDEX IF NOT EXISTS idx_proctor_timetable_module ON proctor_timetable(module_id);
+    DELETE FROM student_timetable;
+    DELETE FROM proctor_timetable;
+    INSERT INTO student_timetable
+        SELECT ee.etudiant_id, e.date_examen, e.creneau_debut, e.creneau_fin, e.id, e.module_id, m.nom, s.nom
+        FROM examen_etudiants ee
+        JOIN examens e ON e.id = ee.examen_id
+        JOIN modules m ON m.id = e.module_id
+        JOIN lieux_examen s ON s.id = e.salle_id;
+    INSERT INTO proctor_timetable
+        SELECT e.prof_surveillant_id, e.date_examen, e.creneau_debut, e.creneau_fin, e.id, e.module_id, m.nom, s.nom
+        FROM examens e
+        JOIN modules m ON m.id = e.module_id
+        JOIN lieux_examen s ON s.id = e.salle_id
+        WHERE e.prof_surveillant_id IS NOT NULL;
+"""
+
+# Recalcul du résumé du tableau de bord (instructions exécutées une à une, dans la transaction de l'appelant)
+DASHBOARD_SUMMARY_REFRESH = (
+    "DELETE FROM dashboard_summary",
+    """INSERT INTO dashboard_summary (section, label, value)
+        SELECT 'totaux', 'etudiants', COUNT(*) FROM etudiants
+        UNION ALL SELECT 'totaux', 'examens', COUNT(DISTINCT module_id) FROM examens
+        UNION ALL SELECT 'totaux', 'salles_utilisees', COUNT(DISTINCT salle_id) FROM examens
+        UNION ALL SELECT 'totaux', 'salles_total', COUNT(*) FROM lieux_examen
+        UNION ALL SELECT 'totaux', 'convocations', COUNT(*) FROM student_timetable""",
+    # Conflits : examens en trop d'un étudiant le même jour (règle 1 examen/jour/étudiant)
+    """INSERT INTO dashboard_summary (section, label, value)
+        SELECT 'totaux', 'conflits', COALESCE(SUM(n - 1), 0)
+        FROM (SELECT COUNT(*) AS n FROM student_timetable GROUP BY etudiant_id, date_examen HAVING COUNT(*) > 1) AS c""",
+    """INSERT INTO dashboard_summary (section, label, value)
+        SELECT 'examens_par_faculte', d.nom, COUNT(DISTINCT ex.module_id)
+        FROM examens ex
+        JOIN modules m ON ex.module_id = m.id
+        JOIN formations f ON m.formation_id = f.id
+        JOIN departements d ON f.dept_id = d.id
+        GROUP BY d.nom""",
+    """INSERT INTO dashboard_summary (section, label, value)
+        SELECT 'etudiants_par_formation', f.nom, COUNT(e.id)
+        FROM etudiants e
+        JOIN formations f ON e.formation_id = f.id
+        GROUP BY f.nom""",
+    """INSERT INTO dashboard_summary (section, label, value)
+        SELECT 'occupation_type', l.type, COUNT(DISTINCT e.salle_id)
+        FROM lieux_examen l
+        LEFT JOIN examens e ON l.id = e.salle_id
+        GROUP BY l.type""",
+    # Charge des surveillants : nombre de professeurs par nombre de surveillances (0 compris)
+    """INSERT INTO dashboard_summary (section, label, value)
+        SELECT 'charge_surveillants', CAST(n AS TEXT), COUNT(*)
+        FROM (SELECT COUNT(e.id) AS n FROM professeurs p LEFT JOIN examens e ON e.prof_surveillant_id = p.id GROUP BY p.id) AS c
+        GROUP BY n""",
+)
+
+# v7 : résumé du tableau de bord, recalculé à chaque sauvegarde de planning et après génération des données
+DASHBOARD_SUMMARY = """
+    CREATE TABLE IF NOT EXISTS dashboard_summary (
+        section TEXT,
+        label TEXT,
+        value REAL,
+        PRIMARY KEY (section, label)
+    );
+""" + "".join(f"    {sql};\n" for sql in DASHBOARD_SUMMARY_REFRESH)
+
+# v8 : version des données du problème (inscriptions, salles, surveillants), incrémentée par triggers à chaque
+#      modification ; avec l'identifiant de la base, elle désigne l'instantané du planificateur (voir snapshot.py)
+DATA_VERSION_TABLES = ("inscriptions", "lieux_examen", "professeurs")
+DATA_VERSION_TRIGGERS = {
+    f"{table}_data_version_{event[0].lower()}": f"""CREATE TRIGGER IF NOT EXISTS {table}_data_version_{event[0].lower()}
+        AFTER {event} ON {table} BEGIN
+        UPDATE schedule_meta SET data_version = data_version + 1;
+    END"""
+    for table in DATA_VERSION_TABLES for event in ("INSERT", "UPDATE", "DELETE")
+}
+DATA_VERSION = """
+    ALTER TABLE schedule_meta ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE schedule_meta ADD COLUMN instance_id TEXT;
+    UPDATE schedule_meta SET instance_id = lower(hex(randomblob(8)));
+""" + "".join(f"    {sql};\n" for sql in DATA_VERSION_TRIGGERS.values())
+
+# Migrations ordonnées : (version atteinte, description, script SQL)
+MIGRATIONS = [
+    (1, "tables de base", CREATE_BASE_TABLES),
+    (2, "clé primaire des inscriptions", INSCRIPTIONS_PRIMARY_KEY),
+    (3, "index de recherche", CREATE_INDEXES),
+    (4, "compteur de générations du planning", SCHEDULE_GENERATION),
+    (5, "index plein texte des noms d'étudiants", STUDENT_NAME_INDEX),
+    (6, "emplois du temps étudiants et surveillants", TIMETABLES),
+    (7, "résumé du tableau de bord", DASHBOARD_SUMMARY),
+    (8, "version des données du planificateur", DATA_VERSION),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    """Version du schéma enregistrée dans la base (0 : base vide ou antérieure aux migrations)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, quiet=False):
+    """
+    Applique les migrations manquantes, chacune dans sa propre transaction.
+    Les données existantes sont conservées. Retourne la liste des versions appliquées.
+    """
+    applied = []
+    for version, description, script in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        try:
+            # executescript valide toute transaction en cours : BEGIN/COMMIT explicites dans le script
+            conn.executescript(f"BEGIN IMMEDIATE;\n{script}\nPRAGMA user_version = {version};\nCOMMIT;")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        applied.append(version)
+        if not quiet:
+            print(f"Migration {version} appliquée : {description}")
+    return applied
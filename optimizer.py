@@ -3,172 +3,916 @@
 # Algorithme de planification avec répartition nominative des étudiants
 # =========================================================================
 
-import sqlite3
+import numpy as np
 import pandas as pd
+import bisect
+import concurrent.futures
+import contextlib
 import datetime
+import os
+import heapq
+import itertools
 import random
+import time
+
+from migrations import DASHBOARD_SUMMARY_REFRESH
+from snapshot import SNAPSHOT_DIR, snapshot_key, load_snapshot, save_snapshot
+from storage import open_storage
+
+# Amplitude du bruit appliqué à l'ordre des modules lors des départs multiples
+MULTI_START_NOISE = 0.3
+
+# Taille des paquets d'examens écrits au fil de l'eau par iter_schedule
+STREAM_CHUNK_SIZE = 500
+
+# Réglages SQLite pour l'écriture en masse du planning (WAL : les lecteurs ne bloquent pas l'écriture)
+SAVE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",
+)
+
+STAGING_EXAM_COLUMNS = ("id", "module_id", "prof_surveillant_id", "salle_id", "date_examen", "creneau_debut", "creneau_fin")
+
+
+class ScheduleStats:
+    """
+    Instrumentation d'une génération : temps par phase (chargement, tri, placement, sauvegarde)
+    et, pour chaque module, nombre de sondages (jour/créneau) avec la raison de chaque rejet.
+    """
+    REASONS = ("conflit_etudiant", "capacite_salles", "manque_surveillants")
+
+    def __init__(self):
+        self.phases = {}      # Phase -> Secondes (cumulées)
+        self.probes = {}      # ID Module -> Nombre de sondages
+        self.rejections = {}  # ID Module -> {Raison: Compteur}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Chronomètre un bloc et cumule sa durée dans la phase donnée."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - t0
+
+    def probe(self, mid, reason=None):
+        """Enregistre un sondage pour le module ; reason=None si le placement a réussi."""
+        self.probes[mid] = self.probes.get(mid, 0) + 1
+        if reason is not None:
+            counts = self.rejections.setdefault(mid, {})
+            counts[reason] = counts.get(reason, 0) + 1
+
+    def merge(self, other):
+        """Ajoute les compteurs et durées d'une autre instrumentation (ex : départ retenu en multi-start)."""
+        for name, secs in other.phases.items():
+            self.phases[name] = self.phases.get(name, 0.0) + secs
+        for mid, n in other.probes.items():
+            self.probes[mid] = self.probes.get(mid, 0) + n
+        for mid, counts in other.rejections.items():
+            for reason, n in counts.items():
+                self.rejections.setdefault(mid, {})[reason] = self.rejections.get(mid, {}).get(reason, 0) + n
+
+    def rejection_totals(self):
+        """Nombre total de rejets par raison."""
+        return {reason: sum(c.get(reason, 0) for c in self.rejections.values()) for reason in self.REASONS}
+
+    def modules_frame(self):
+        """Tableau par module : sondages et rejets par raison, modules les plus sondés en premier."""
+        rows = [dict(module_id=mid, sondages=n, **{r: self.rejections.get(mid, {}).get(r, 0) for r in self.REASONS})
+                for mid, n in self.probes.items()]
+        frame = pd.DataFrame(rows, columns=["module_id", "sondages", *self.REASONS])
+        return frame.sort_values("sondages", ascending=False, ignore_index=True)
+
+    def to_dict(self):
+        return {
+            'phases_s': {name: round(secs, 4) for name, secs in self.phases.items()},
+            'probes': sum(self.probes.values()),
+            'rejections': self.rejection_totals(),
+        }
+
+
+class CohortDayIndex:
+    """
+    Occupation Cohorte × Jour sous forme de matrice booléenne NumPy.
+    Une ligne par jour (contiguë en mémoire) : la vérification et le marquage
+    d'un module se font en une seule opération vectorisée sur les indices de cohortes.
+    """
+    def __init__(self, n_cohorts, n_days):
+        self.occupied = np.zeros((n_days, n_cohorts), dtype=bool)
+
+    def is_free(self, day_idx, cohort_idx):
+        """Vrai si aucune des cohortes n'a déjà un examen ce jour-là."""
+        return not self.occupied[day_idx, cohort_idx].any()
+
+    def mark(self, day_idx, cohort_idx):
+        """Marque les cohortes comme occupées ce jour-là."""
+        self.occupied[day_idx, cohort_idx] = True
+
+
+def _take_rooms(capacities, buckets, n_students):
+    """Prend les salles libres dans l'ordre des capacités donné jusqu'à couvrir l'effectif."""
+    selected = []
+    current_cap = 0
+    for cap in capacities:
+        for room_id in buckets[cap]:
+            selected.append((room_id, cap))
+            current_cap += cap
+            if current_cap >= n_students:
+                return selected
+    return None
+
+
+def amphis_first_strategy(capacities, buckets, n_students):
+    """
+    Politique historique : si gros effectif (> 45), on veut des Amphis en priorité (capacité décroissante),
+    sinon on remplit d'abord les petites salles (capacité croissante).
+    """
+    if n_students > 45:
+        return _take_rooms(reversed(capacities), buckets, n_students)
+    return _take_rooms(capacities, buckets, n_students)
+
+
+def best_fit_strategy(capacities, buckets, n_students):
+    """
+    Plus petit ensemble de salles : les plus grandes salles tant que le reste ne tient pas
+    dans une seule, puis la plus petite salle suffisante (recherche dichotomique).
+    """
+    free = {cap: iter(buckets[cap]) for cap in capacities if buckets[cap]}
+    left = {cap: len(buckets[cap]) for cap in free}
+    nonempty = list(free)
+    selected = []
+    remaining = n_students
+    while remaining > 0 and nonempty:
+        i = bisect.bisect_left(nonempty, remaining)
+        cap = nonempty[i] if i < len(nonempty) else nonempty[-1]
+        selected.append((next(free[cap]), cap))
+        remaining -= cap
+        left[cap] -= 1
+        if not left[cap]:
+            nonempty.remove(cap)
+    return selected if remaining <= 0 else None
+
+
+class FreeRoomIndex:
+    """
+    Index persistant des salles libres par (date, créneau).
+    Les salles sont rangées par seaux de capacité (capacités distinctes triées) ; la sélection
+    est déléguée à une stratégie interchangeable et la réservation retire les salles en O(1).
+    """
+    def __init__(self, room_ids, room_caps, strategy=amphis_first_strategy):
+        """room_ids, room_caps : tableaux alignés (ID Salle, Capacité)."""
+        self.strategy = strategy
+        self.capacities = np.unique(room_caps).tolist()
+        self._template = {cap: dict.fromkeys(room_ids[room_caps == cap].tolist()) for cap in self.capacities}
+        self._total_capacity = int(room_caps.sum())
+        self._room_cap = dict(zip(room_ids.tolist(), room_caps.tolist()))
+        self._free = {}      # (Date, Créneau) -> {Capacité: salles libres (dict ordonné)}
+        self._free_cap = {}  # (Date, Créneau) -> Places libres restantes
+
+    def _buckets(self, key):
+        if key not in self._free:
+            self._free[key] = {cap: dict(ids) for cap, ids in self._template.items()}
+            self._free_cap[key] = self._total_capacity
+        return self._free[key]
+
+    def select(self, d_str, slot, n_students):
+        """Retourne [(ID Salle, Capacité), ...] couvrant l'effectif, ou None si le créneau est saturé."""
+        buckets = self._buckets((d_str, slot))
+        if self._free_cap[(d_str, slot)] < n_students:
+            return None
+        return self.strategy(self.capacities, buckets, n_students)
+
+    def free_capacity(self, d_str, slot):
+        """Retourne (places libres, nombre de salles libres) sur ce créneau."""
+        buckets = self._buckets((d_str, slot))
+        return self._free_cap[(d_str, slot)], sum(len(ids) for ids in buckets.values())
+
+    def occupy(self, d_str, slot, room_id):
+        """Marque une salle existante comme occupée (salles inconnues ou déjà prises ignorées)."""
+        cap = self._room_cap.get(room_id)
+        if cap is not None and room_id in self._buckets((d_str, slot))[cap]:
+            self.reserve(d_str, slot, [(room_id, cap)])
+
+    def rooms_needed(self, n_students):
+        """Nombre de salles que la stratégie retiendrait pour cet effectif si toutes étaient libres (None si impossible)."""
+        rooms = self.strategy(self.capacities, self._template, n_students)
+        return len(rooms) if rooms is not None else None
+
+    def reserve(self, d_str, slot, rooms):
+        """Marque les salles [(ID Salle, Capacité), ...] comme occupées sur ce créneau."""
+        buckets = self._buckets((d_str, slot))
+        for room_id, cap in rooms:
+            del buckets[cap][room_id]
+            self._free_cap[(d_str, slot)] -= cap
+
+
+class ProctorAllocator:
+    """
+    Allocation des surveillants par jour : seaux indexés par (même département, charge du jour),
+    profs du département du module d'abord puis les autres, par charge croissante ; mise à jour en O(1).
+    """
+    def __init__(self, prof_ids, prof_depts, max_daily=3):
+        """prof_ids, prof_depts : tableaux alignés (ID Prof, Département ; -1 si aucun)."""
+        self.max_daily = max_daily
+        self.prof_dept = dict(zip(prof_ids.tolist(), prof_depts.tolist()))
+        self.daily_load = {}  # (ID Prof, Date) -> Compteur
+        self._dept_profs = {}
+        for pid, dept in self.prof_dept.items():
+            self._dept_profs.setdefault(dept, []).append(pid)
+        self._days = {}       # Date -> (seaux par charge, seaux par département et charge)
+
+    def _day(self, d_str):
+        if d_str not in self._days:
+            levels = range(1, self.max_daily)
+            by_load = [dict.fromkeys(self.prof_dept)] + [{} for _ in levels]
+            by_dept = {dept: [dict.fromkeys(pids)] + [{} for _ in levels]
+                       for dept, pids in self._dept_profs.items()}
+            self._days[d_str] = (by_load, by_dept)
+        return self._days[d_str]
+
+    def select(self, d_str, dept, k):
+        """Retourne les k surveillants prioritaires pour ce jour, ou None s'il n'y en a pas assez."""
+        by_load, by_dept = self._day(d_str)
+        selected = []
+        if k <= 0:
+            return selected
+        # Même département (+10) d'abord, par charge croissante (Équilibrage)
+        for level in by_dept.get(dept, []):
+            for pid in level:
+                selected.append(pid)
+                if len(selected) == k:
+                    return selected
+        # Puis les autres départements ; les profs du département sont déjà tous retenus
+        for level in by_load:
+            for pid in level:
+                if self.prof_dept[pid] == dept:
+                    continue
+                selected.append(pid)
+                if len(selected) == k:
+                    return selected
+        return None
+
+    def remaining(self, d_str):
+        """Nombre total de surveillances encore disponibles ce jour-là."""
+        by_load, _ = self._day(d_str)
+        return sum((self.max_daily - load) * len(level) for load, level in enumerate(by_load))
+
+    def occupy(self, d_str, pid):
+        """Comptabilise une surveillance existante (profs inconnus ou déjà au maximum ignorés)."""
+        if pid in self.prof_dept and self.daily_load.get((pid, d_str), 0) < self.max_daily:
+            self.assign(d_str, pid)
+
+    def assign(self, d_str, pid):
+        """Ajoute une surveillance au prof pour ce jour (il sort des seaux une fois au maximum)."""
+        by_load, by_dept = self._day(d_str)
+        load = self.daily_load.get((pid, d_str), 0)
+        dept = self.prof_dept[pid]
+        del by_load[load][pid]
+        del by_dept[dept][load][pid]
+        load += 1
+        self.daily_load[(pid, d_str)] = load
+        if load < self.max_daily:
+            by_load[load][pid] = None
+            by_dept[dept][load][pid] = None
+
 
 class ExamScheduler:
-    def __init__(self, db_path):
-        """Initialisation avec chemin vers la base SQLite."""
-        self.conn = sqlite3.connect(db_path)
+    # Définition des créneaux horaires standards
+    SLOTS = [("08:30", "10:00"), ("10:30", "12:00"), ("13:00", "14:30"), ("15:00", "16:30")]
+
+    # Tableaux du problème persistés dans les instantanés (voir snapshot.py) ; le reste en est dérivé
+    PROBLEM_ARRAYS = ("room_ids", "room_caps", "prof_ids", "prof_depts", "module_ids", "module_ptr",
+                      "module_students", "student_ids", "student_cohort", "cohort_sets")
+
+    def __init__(self, db_path, room_strategy=amphis_first_strategy, snapshot_dir=SNAPSHOT_DIR):
+        """
+        Initialisation avec la base : chemin SQLite ou URL (sqlite:///..., postgresql://..., voir storage.open_storage).
+        room_strategy : politique de choix des salles (voir amphis_first_strategy, best_fit_strategy).
+        snapshot_dir : dossier des instantanés du problème (None : toujours recharger depuis la base).
+        """
+        self.db_path = db_path
+        self.room_strategy = room_strategy
+        self.snapshot_dir = snapshot_dir
+        self.snapshot = None  # Clé de l'instantané projeté en mémoire (None : tableaux en mémoire privée)
+        self.quiet = False  # Pas d'avertissements (départs multiples exécutés en parallèle)
+        self.stats = ScheduleStats()
+        self.storage = open_storage(db_path)
+        self.conn = self.storage.connect()
         self.cursor = self.conn.cursor()
+        self.storage.migrate(self.conn, quiet=True)  # Schéma à jour (compteur de générations utilisé par save)
+
+    def __getstate__(self):
+        """
+        Copie transmissible aux processus de calcul : données chargées sans la connexion ni le stockage.
+        Si le problème vient d'un instantané, seuls sa clé et son dossier sont transmis :
+        chaque processus le projette à nouveau en mémoire (pages partagées).
+        """
+        state = self.__dict__.copy()
+        state['conn'] = state['cursor'] = state['storage'] = None
+        if self.snapshot is not None:
+            for name in self.PROBLEM_ARRAYS:
+                state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        """Reprise dans un processus de calcul : instantané projeté, ou relu depuis la base s'il a été supprimé."""
+        self.__dict__.update(state)
+        if self.snapshot is None:
+            return
+        arrays = self._load_snapshot(self.snapshot)
+        if arrays is None:
+            self.storage = open_storage(self.db_path)
+            self.conn = self.storage.connect(readonly=True)
+            try:
+                arrays = self._build_problem()
+            finally:
+                self.conn.close()
+                self.conn = self.storage = None
+            self.snapshot = None
+        self._set_problem(arrays)
+
+    def _load_snapshot(self, key):
+        """Tableaux de l'instantané, ou None s'il est absent ou incomplet."""
+        arrays = load_snapshot(key, self.snapshot_dir)
+        if arrays is None or not set(self.PROBLEM_ARRAYS) <= set(arrays):
+            return None
+        return arrays
 
     def get_data(self):
-        """Charge les données nécessaires (Modules, Salles, Profs, Inscriptions) en mémoire."""
-        self.modules = pd.read_sql("""
+        """
+        Charge le problème en mémoire sous forme compacte (tableaux NumPy int32) :
+        - inscriptions en index CSR module -> étudiants (module_ptr, module_students) ;
+        - cohortes (étudiants partageant exactement le même ensemble de modules) en index CSR
+          module -> cohortes ; les conflits sont vérifiés par cohorte ;
+        - capacités des salles et départements des surveillants en tableaux alignés sur leurs IDs.
+        Les tableaux sont repris de l'instantané de la version courante des données s'il existe
+        (projection mémoire, quasi immédiate), sinon calculés puis enregistrés comme instantané
+        (conservés en mémoire privée si le dossier des instantanés n'est pas accessible en écriture).
+        """
+        self.modules = self.storage.read_frame(self.conn, """
             SELECT m.*, f.dept_id 
             FROM modules m 
             JOIN formations f ON m.formation_id = f.id
-        """, self.conn)
-        self.rooms = pd.read_sql("SELECT * FROM lieux_examen", self.conn) 
-        self.profs = pd.read_sql("SELECT * FROM professeurs", self.conn)
-        
-        # Nombre d'étudiants par module pour dimensionner les besoins en salles
-        self.module_counts = pd.read_sql("SELECT module_id, COUNT(etudiant_id) as cnt FROM inscriptions GROUP BY module_id", self.conn).set_index('module_id')['cnt'].to_dict()
-        
-        # Liste complète des IDs étudiants par module
-        self.inscriptions = pd.read_sql("SELECT module_id, etudiant_id FROM inscriptions", self.conn)
-        self.module_students = self.inscriptions.groupby('module_id')['etudiant_id'].apply(list).to_dict()
-
-    def generate_schedule(self, start_date, end_date, formation_ids=None, append=False):
+        """)
+        self.snapshot = None
+        if self.snapshot_dir is None:
+            self._set_problem(self._build_problem())
+            return
+        key = snapshot_key(self.storage, self.conn)
+        arrays = self._load_snapshot(key)
+        if arrays is None:
+            arrays = self._build_problem()
+            try:
+                save_snapshot(key, arrays, self.snapshot_dir)
+            except OSError as e:
+                if not self.quiet:
+                    print(f"WARNING: Instantané non enregistré ({e}) ; données conservées en mémoire")
+                self._set_problem(arrays)
+                return
+            mapped = self._load_snapshot(key)
+            if mapped is None:  # Supprimé entre-temps par un autre processus
+                self._set_problem(arrays)
+                return
+            arrays = mapped
+        self.snapshot = key
+        self._set_problem(arrays)
+
+    def _build_problem(self):
+        """Lit salles, surveillants et inscriptions et calcule les tableaux du problème ({nom: tableau}, voir PROBLEM_ARRAYS)."""
+        arrays = {}
+        rooms = self.storage.read_frame(self.conn, "SELECT id, capacite FROM lieux_examen")
+        arrays['room_ids'] = rooms['id'].to_numpy(np.int32)
+        arrays['room_caps'] = rooms['capacite'].to_numpy(np.int32)
+        profs = self.storage.read_frame(self.conn, "SELECT id, dept_id FROM professeurs")
+        arrays['prof_ids'] = profs['id'].to_numpy(np.int32)
+        arrays['prof_depts'] = profs['dept_id'].fillna(-1).to_numpy(np.int32)
+
+        # Inscriptions (module, étudiant) lues par paquets directement dans un tableau int32 (ni DataFrame ni listes)
+        chunks = self.storage.iter_rows(self.conn, "SELECT module_id, etudiant_id FROM inscriptions")
+        pairs = np.fromiter(itertools.chain.from_iterable(itertools.chain.from_iterable(chunks)), dtype=np.int32)
+        enr_module, enr_student = pairs[0::2], pairs[1::2]
+        order = np.lexsort((enr_module, enr_student))  # Par étudiant, puis module
+        enr_module, enr_student = enr_module[order], enr_student[order]
+
+        # Modules inscrits : ID -> indice dense (table de correspondance), effectifs
+        per_module = np.bincount(enr_module)
+        module_ids = np.flatnonzero(per_module).astype(np.int32)
+        dense = np.zeros(len(per_module), dtype=np.int32)
+        dense[module_ids] = np.arange(len(module_ids), dtype=np.int32)
+        enr_midx = dense[enr_module]
+        arrays['module_ids'] = module_ids
+
+        # Index CSR module -> étudiants (IDs triés) : les étudiants du module i sont module_students[module_ptr[i]:module_ptr[i+1]]
+        arrays['module_ptr'] = np.concatenate(([0], np.cumsum(per_module[module_ids]))).astype(np.int64)
+        arrays['module_students'] = enr_student[np.argsort(enr_midx, kind='stable')]
+
+        # Cohortes : ensembles de modules identiques (une ligne complétée par -1 par étudiant, dédoublonnée)
+        first = np.flatnonzero(np.diff(enr_student, prepend=-1))  # Début de chaque étudiant (tableau trié)
+        per_student = np.diff(first, append=len(enr_student))
+        width = int(per_student.max()) if len(per_student) else 0
+        sets = np.full((len(first), width), -1, dtype=np.int32)
+        rank = np.arange(len(enr_student)) - np.repeat(first, per_student)
+        sets[np.repeat(np.arange(len(first)), per_student), rank] = enr_midx
+        order = np.lexsort(sets.T[::-1]) if width else np.arange(len(sets))  # Tri lexicographique des lignes
+        new_set = np.ones(len(order), dtype=bool)
+        new_set[1:] = (sets[order[1:]] != sets[order[:-1]]).any(axis=1)
+        student_cohort = np.empty(len(order), dtype=np.int32)
+        student_cohort[order] = np.cumsum(new_set) - 1
+        arrays['student_ids'] = enr_student[first]
+        arrays['student_cohort'] = student_cohort  # Aligné sur student_ids
+        arrays['cohort_sets'] = sets[order[new_set]]  # Indices de modules par cohorte (complétés par -1)
+        return arrays
+
+    def _set_problem(self, arrays):
+        """Installe les tableaux du problème et en dérive les index de travail (effectifs, cohortes par module)."""
+        for name in self.PROBLEM_ARRAYS:
+            setattr(self, name, arrays[name])
+        module_ids = self.module_ids.tolist()
+        counts = np.diff(self.module_ptr)
+        self.module_counts = dict(zip(module_ids, counts.tolist()))  # Nombre d'étudiants par module
+        self._module_index = {mid: i for i, mid in enumerate(module_ids)}
+        cohort_sets = np.asarray(self.cohort_sets)
+        self.cohort_sizes = np.bincount(self.student_cohort, minlength=len(cohort_sets)).astype(np.int32)
+        self.cohort_modules = [tuple(self.module_ids[row[row >= 0]].tolist()) for row in cohort_sets]
+
+        # Index CSR module -> cohortes (vues int32 par module, utilisées par CohortDayIndex)
+        link_cohort, link_module = np.nonzero(cohort_sets >= 0)
+        link_module = cohort_sets[link_cohort, link_module]
+        order = np.argsort(link_module, kind='stable')
+        cohort_ptr = np.concatenate(([0], np.cumsum(np.bincount(link_module, minlength=len(module_ids)))))
+        self.module_cohort_idx = link_cohort[order].astype(np.int32)
+        self.module_cohorts = {mid: self.module_cohort_idx[cohort_ptr[i]:cohort_ptr[i + 1]]
+                               for i, mid in enumerate(module_ids)}
+
+    def students_of(self, mid):
+        """IDs des étudiants inscrits au module (vue int32 sur l'index CSR)."""
+        i = self._module_index[mid]
+        return self.module_students[self.module_ptr[i]:self.module_ptr[i + 1]]
+
+    def cohorts_of_students(self, student_ids):
+        """Cohorte de chaque étudiant (tableau), -1 pour un étudiant sans inscription."""
+        student_ids = np.asarray(student_ids)
+        if not len(self.student_ids):
+            return np.full(len(student_ids), -1, dtype=np.int32)
+        pos = np.minimum(np.searchsorted(self.student_ids, student_ids), len(self.student_ids) - 1)
+        return np.where(self.student_ids[pos] == student_ids, self.student_cohort[pos], -1)
+
+    def build_conflict_graph(self, mids):
+        """
+        Graphe de conflits module-module construit une seule fois à partir des cohortes.
+        Retourne {module: {module voisin: nombre d'étudiants partagés}}.
+        """
+        graph = {mid: {} for mid in mids}
+        for c_idx, c_modules in enumerate(self.cohort_modules):
+            size = int(self.cohort_sizes[c_idx])
+            c_mids = [m for m in c_modules if m in graph]
+            for a, b in itertools.combinations(c_mids, 2):
+                graph[a][b] = graph[a].get(b, 0) + size
+                graph[b][a] = graph[b].get(a, 0) + size
+        return graph
+
+    def generate_schedule(self, start_date, end_date, formation_ids=None, append=False, mode="greedy",
+                          n_starts=1, workers=None):
         """
         Génère l'emploi du temps en équilibrant les charges et en évitant les conflits.
         Contraintes : 1 examen/jour/étudiant, Max 3 surveillances/jour/prof, Respect capacité salles.
+
+        append : mode incrémental. Les examens déjà en base hors des modules ciblés sont conservés
+                 et occupent salles, surveillants et étudiants ; ceux des modules ciblés sont remplacés.
+        mode : "greedy" (modules triés par effectif, premier jour libre)
+               ou "dsatur" (coloration du graphe de conflits par degré de saturation).
+               Chaque mode correspond à un générateur _iter_<mode>(mids) de (module, entrées).
+        n_starts : nombre de départs aléatoires (ordre des modules bruité) exécutés en parallèle
+                   sur `workers` processus ; seul le meilleur planning est sauvegardé.
         """
-        self.get_data()
-        existing_exams = pd.read_sql("SELECT * FROM examens", self.conn)
-        
-        # Trackers d'état pour le respect des contraintes en temps réel
-        prof_daily_load = {}     # (ID Prof, Date) -> Compteur
-        student_daily_load = {}  # (ID Étudiant, Date) -> Booléen
-        room_schedule = {}      # (ID Salle, Date, Créneau) -> Occupé?
-        
-        # Définition des créneaux horaires standards
-        slots = [("08:30", "10:00"), ("10:30", "12:00"), ("13:00", "14:30"), ("15:00", "16:30")]
-        
-        # Filtrage et tri des modules (Priorité aux plus gros effectifs)
-        target_modules = self.modules
-        if formation_ids:
-            target_modules = target_modules[target_modules['formation_id'].isin(formation_ids)]
-        sorted_mids = sorted(target_modules['id'].tolist(), key=lambda x: self.module_counts.get(x, 0), reverse=True)
-        
-        new_exams = []
-        delta_days = (end_date - start_date).days + 1
+        target_mids, replaced = self._prepare(start_date, end_date, formation_ids, append)
+        if n_starts > 1:
+            new_exams = self._multi_start(mode, target_mids, n_starts, workers)
+        else:
+            new_exams = self._schedule(mode, target_mids)
 
-        for mid in sorted_mids:
-            n_students = self.module_counts.get(mid, 0)
-            if n_students == 0: continue
-            
-            m_dept = target_modules[target_modules['id'] == mid]['dept_id'].values[0]
-            m_students = self.module_students.get(mid, [])
-            
-            assigned = False
+        self.save(new_exams, append, replace_modules=replaced)
+        return len(new_exams)
+
+    def iter_schedule(self, start_date, end_date, formation_ids=None, append=False, mode="greedy",
+                      chunk_size=STREAM_CHUNK_SIZE):
+        """
+        Variante itérative de generate_schedule : produit un événement par module traité
+        {module_id, placed, date_examen, creneau_debut, creneau_fin, salles, progress}.
+        Les examens sont écrits par paquets de chunk_size dans les tables de préparation au fil de l'eau,
+        puis basculés dans le planning à la fin. Si l'itération est interrompue (close()),
+        le planning partiel déjà calculé est sauvegardé.
+        """
+        target_mids, replaced = self._prepare(start_date, end_date, formation_ids, append)
+        placements = self._iter_fn(mode)(target_mids)
+        self._stage_begin()
+        buffer, next_id, n_done, finished = [], 1, 0, False
+        try:
+            for mid, entries in placements:
+                n_done += 1
+                if entries:
+                    buffer.extend(entries)
+                    if len(buffer) >= chunk_size:
+                        next_id = self._stage_rows(buffer, next_id)
+                        buffer = []
+                first = entries[0] if entries else {}
+                yield {
+                    'module_id': mid,
+                    'placed': bool(entries),
+                    'date_examen': first.get('date_examen'),
+                    'creneau_debut': first.get('creneau_debut'),
+                    'creneau_fin': first.get('creneau_fin'),
+                    'salles': [e['salle_id'] for e in entries or []],
+                    'progress': n_done / len(target_mids),
+                }
+            finished = True
+        except GeneratorExit:
+            finished = True  # Arrêt anticipé demandé : on conserve le planning partiel
+            raise
+        finally:
+            if finished:
+                self._stage_rows(buffer, next_id)
+                self._stage_commit(append, replaced)
+
+    def _prepare(self, start_date, end_date, formation_ids, append):
+        """Charge les données, filtre les modules et initialise les trackers. Retourne (modules à placer, modules remplacés)."""
+        if end_date < start_date:
+            raise ValueError(f"Période invalide : la date de fin ({end_date}) précède la date de début ({start_date})")
+        self.stats = ScheduleStats()
+        with self.stats.phase("chargement"):
+            self.get_data()
             
+            # Filtrage des modules à planifier
+            target_modules = self.modules
+            if formation_ids:
+                target_modules = target_modules[target_modules['formation_id'].isin(formation_ids)]
+            self.module_dept = target_modules.set_index('id')['dept_id'].to_dict()
+            target_mids = [mid for mid in target_modules['id'].tolist() if self.module_counts.get(mid, 0) > 0]
+
+            self.start_date = start_date
+            self.delta_days = (end_date - start_date).days + 1
+            self.existing_exams, self.existing_links = self._load_existing(target_modules['id'].tolist()) if append else (None, None)
+            self.priority = {mid: self.module_counts[mid] for mid in target_mids}  # Ordre de placement
+            self._init_trackers()
+        return target_mids, target_modules['id'].tolist()
+
+    def _iter_fn(self, mode):
+        """Générateur de placements associé au mode de planification."""
+        iter_fn = getattr(self, f"_iter_{mode}", None)
+        if iter_fn is None:
+            raise ValueError(f"Mode de planification inconnu : {mode}")
+        return iter_fn
+
+    def _schedule(self, mode, mids):
+        """Exécute le mode jusqu'au bout et retourne la liste complète des examens."""
+        return [e for _, entries in self._iter_fn(mode)(mids) if entries for e in entries]
+
+    def _load_existing(self, replaced_mids):
+        """Charge l'occupation déjà planifiée (examens et répartition nominative), hors modules re-planifiés."""
+        exams = self.storage.read_frame(self.conn, "SELECT module_id, prof_surveillant_id, salle_id, date_examen, creneau_debut FROM examens")
+        links = self.storage.read_frame(self.conn, """
+            SELECT e.module_id, e.date_examen, ee.etudiant_id
+            FROM examen_etudiants ee
+            JOIN examens e ON ee.examen_id = e.id
+        """)
+        return exams[~exams['module_id'].isin(replaced_mids)], links[~links['module_id'].isin(replaced_mids)]
+
+    def _multi_start(self, mode, mids, n_starts, workers=None):
+        """
+        Exécute n_starts départs randomisés en parallèle (ProcessPoolExecutor) et retourne le meilleur.
+        Les données chargées sont transmises une seule fois à chaque processus (initializer).
+        Le départ 0 conserve l'ordre déterministe : le résultat n'est jamais pire qu'un départ unique.
+        """
+        self._iter_fn(mode)  # Validation du mode avant de lancer les processus
+        workers = min(workers or os.cpu_count() or 1, n_starts)
+        tasks = [(mode, mids, seed, 0.0 if seed == 0 else MULTI_START_NOISE) for seed in range(n_starts)]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                    initargs=(self,)) as pool:
+            results = list(pool.map(_run_start, tasks))
+
+        _, new_exams, unscheduled, stats = min(results, key=lambda r: r[0])
+        self.multi_start_scores = [r[0] for r in results]
+        self.stats.merge(stats)
+        self.unscheduled = []
+        for mid in unscheduled:
+            self._warn_unscheduled(mid)
+        return new_exams
+
+    def run_start(self, mode, mids, seed, noise):
+        """
+        Un départ randomisé : ordre des modules bruité (effectif × (1 + noise × U[0,1])) et graine dédiée.
+        Retourne (score, examens, modules non planifiés, instrumentation).
+        """
+        self.stats = ScheduleStats()
+        random.seed(seed)
+        self.priority = {mid: self.module_counts[mid] * (1 + noise * random.random()) for mid in mids}
+        self._init_trackers()
+        new_exams = self._schedule(mode, mids)
+        return self.score(new_exams), new_exams, self.unscheduled, self.stats
+
+    def score(self, exams):
+        """Qualité d'un planning (à minimiser) : (modules non planifiés, jours utilisés, déséquilibre des surveillances)."""
+        loads = dict.fromkeys(self.proctors.prof_dept, 0)
+        for e in exams:
+            loads[e['prof_surveillant_id']] += 1
+        imbalance = max(loads.values()) - min(loads.values()) if loads else 0
+        return len(self.unscheduled), len({e['date_examen'] for e in exams}), imbalance
+
+    def _warn_unscheduled(self, mid):
+        """Enregistre (et signale) un module impossible à planifier."""
+        self.unscheduled.append(mid)
+        if not self.quiet:
+            print(f"WARNING: Impossible de planifier Module {mid} ({self.module_counts[mid]} étudiants)")
+
+    def _init_trackers(self):
+        """(Ré)initialise les trackers d'état pour le respect des contraintes en temps réel."""
+        self.unscheduled = []
+        self.proctors = ProctorAllocator(self.prof_ids, self.prof_depts)  # (ID Prof, Date) -> Compteur (Max 3 gardes par jour)
+        self.cohort_days = CohortDayIndex(len(self.cohort_sizes), self.delta_days)  # (Cohorte, Jour) -> Occupé?
+        self.free_rooms = FreeRoomIndex(self.room_ids, self.room_caps, self.room_strategy)  # (Date, Créneau) -> Salles libres
+
+        # Mode incrémental : l'occupation existante est chargée dans les trackers
+        if self.existing_exams is not None:
+            for e in self.existing_exams.itertuples(index=False):
+                self.free_rooms.occupy(e.date_examen, e.creneau_debut, e.salle_id)
+                self.proctors.occupy(e.date_examen, e.prof_surveillant_id)
+
+            links = self.existing_links
+            day_idx = (pd.to_datetime(links['date_examen']) - pd.Timestamp(self.start_date)).dt.days
+            cohort_idx = self.cohorts_of_students(links['etudiant_id'].to_numpy())
+            in_window = (day_idx.between(0, self.delta_days - 1) & (cohort_idx >= 0)).to_numpy()
+            self.cohort_days.mark(day_idx.to_numpy()[in_window], cohort_idx[in_window])
+
+    def _place_first_day(self, mid, skip_days=()):
+        """Place le module sur le premier jour faisable. Retourne (jour, entrées) ou (None, None)."""
+        with self.stats.phase("placement"):
+            for day_off in range(self.delta_days):
+                # skip_days : jours déjà connus comme conflictuels (ex. pris par un voisin du graphe), non sondés
+                if day_off in skip_days:
+                    continue
+                # Vérification Conflit Étudiant : S'assurer qu'aucune cohorte n'a déjà un examen ce jour-là
+                if not self.cohort_days.is_free(day_off, self.module_cohorts[mid]):
+                    self.stats.probe(mid, "conflit_etudiant")
+                    continue
+                entries = self._place_module(mid, day_off)
+                if entries:
+                    return day_off, entries # Jour trouvé
+        return None, None
+
+    def _iter_greedy(self, mids):
+        """Heuristique gloutonne : modules par effectif décroissant, premier jour/créneau faisable."""
+        # Tri des modules (Priorité aux plus gros effectifs)
+        with self.stats.phase("tri"):
+            sorted_mids = sorted(mids, key=lambda x: self.priority[x], reverse=True)
+
+        for mid in sorted_mids:
             # Recherche d'un jour disponible
-            for day_off in range(delta_days):
-                curr_date = start_date + datetime.timedelta(days=day_off)
-                d_str = str(curr_date)
-                
-                # Vérification Conflit Étudiant : S'assurer qu'aucun étudiant n'a déjà un examen ce jour-là
-                if any(student_daily_load.get((sid, d_str)) for sid in m_students):
+            _, entries = self._place_first_day(mid)
+            if not entries:
+                self._warn_unscheduled(mid)
+            yield mid, entries
+
+    def _iter_dsatur(self, mids):
+        """
+        Coloration DSatur du graphe de conflits : un jour = une couleur.
+        Le module le plus contraint (jours déjà pris par ses voisins, puis degré, puis priorité/effectif)
+        est placé sur le premier jour faisable, ce qui tasse la session sur un minimum de jours.
+        """
+        with self.stats.phase("tri"):
+            graph = self.build_conflict_graph(mids)
+            neighbor_days = {mid: set() for mid in mids}  # Jours interdits (saturation)
+
+            # File de priorité avec entrées périmées ignorées au dépilage
+            heap = [(0, -len(graph[mid]), -self.priority[mid], mid) for mid in mids]
+            heapq.heapify(heap)
+        done = set()
+
+        while heap:
+            neg_sat, _, _, mid = heapq.heappop(heap)
+            if mid in done or -neg_sat != len(neighbor_days[mid]):
+                continue
+            done.add(mid)
+
+            day_off, entries = self._place_first_day(mid, skip_days=neighbor_days[mid])
+            if not entries:
+                self._warn_unscheduled(mid)
+            yield mid, entries
+            if not entries:
+                continue
+
+            # Mise à jour de la saturation des voisins non encore placés
+            for nb in graph[mid]:
+                if nb in done or day_off in neighbor_days[nb]:
                     continue
-                
-                # Recherche d'un créneau disponible dans la journée
-                for start_t, end_t in slots:
-                    # Trouver des salles libres pour ce créneau
-                    all_available = [r for _, r in self.rooms.iterrows() if not room_schedule.get((r['id'], d_str, start_t))]
-                    
-                    # Stratégie de sélection : Priorité aux Amphis uniquement si l'effectif est > 30 (par exemple)
-                    # Ou plus simplement, on trie par capacité CROISSANTE pour utiliser les petites salles en priorité
-                    # s'ils peuvent contenir le groupe.
-                    
-                    if n_students > 45: # Si gros effectif, on veut des Amphis en priorité
-                        available_rooms = sorted(all_available, key=lambda x: x['capacite'], reverse=True)
-                    else: # Petit effectif, on veut des petites salles
-                        available_rooms = sorted(all_available, key=lambda x: x['capacite'])
-
-                    # Sélectionner le nombre minimum de salles nécessaires
-                    selected_rooms = []
-                    current_cap = 0
-                    for r in available_rooms:
-                        selected_rooms.append(r)
-                        current_cap += r['capacite']
-                        if current_cap >= n_students: break
-                    
-                    if current_cap < n_students: continue # Pas assez de place sur ce créneau
-                        
-                    # Trouver un professeur surveillant par salle
-                    needed_profs = len(selected_rooms)
-                    candidates = []
-                    for _, p in self.profs.iterrows():
-                        if prof_daily_load.get((p['id'], d_str), 0) < 3: # Max 3 gardes par jour
-                            # Score de priorité (Même département = +10)
-                            score = 10 if p['dept_id'] == m_dept else 0
-                            score -= prof_daily_load.get((p['id'], d_str), 0) # Équilibrage
-                            candidates.append((score, p['id']))
-                    
-                    candidates.sort(key=lambda x: x[0], reverse=True)
-                    if len(candidates) < needed_profs: continue # Pas assez de profs
-                        
-                    # --- AFFECTATION EFFECTIVE ---
-                    final_profs = [c[1] for c in candidates[:needed_profs]]
-                    random.shuffle(m_students) # Mélange pour la répartition
-                    student_idx = 0
-                    
-                    for i, room in enumerate(selected_rooms):
-                        pid = final_profs[i]
-                        # Découpage de la liste des étudiants pour cette salle précise
-                        room_cap = room['capacite']
-                        assigned_students = m_students[student_idx : student_idx + room_cap]
-                        student_idx += room_cap
-                        
-                        exam_entry = {
-                            'module_id': mid,
-                            'prof_surveillant_id': pid,
-                            'salle_id': room['id'],
-                            'date_examen': d_str,
-                            'creneau_debut': start_t,
-                            'creneau_fin': end_t,
-                            'students': assigned_students # Étudiants rattachés à cette salle
-                        }
-                        new_exams.append(exam_entry)
-                        
-                        # Mise à jour de l'état de l'occupantion
-                        prof_daily_load[(pid, d_str)] = prof_daily_load.get((pid, d_str), 0) + 1
-                        room_schedule[(room['id'], d_str, start_t)] = True
-                    
-                    # Marquer les étudiants comme occupés ce jour-là
-                    for sid in m_students: student_daily_load[(sid, d_str)] = True
-                        
-                    assigned = True
-                    break # Créneau trouvé
-                if assigned: break # Jour trouvé
-            
-            if not assigned:
-                print(f"WARNING: Impossible de planifier Module {mid} ({n_students} étudiants)")
+                neighbor_days[nb].add(day_off)
+                heapq.heappush(heap, (-len(neighbor_days[nb]), -len(graph[nb]), -self.priority[nb], nb))
 
-        self.save(new_exams, append)
-        return len(new_exams)
+    def _place_module(self, mid, day_off, slots=None):
+        """
+        Tente de placer le module sur un jour donné (salles + surveillants sur un même créneau).
+        slots : créneaux autorisés (par défaut tous les SLOTS, dans l'ordre).
+        Retourne la liste des entrées d'examen (une par salle) ou None si aucun créneau ne convient.
+        """
+        n_students = self.module_counts[mid]
+        m_dept = self.module_dept[mid]
+        m_cohorts = self.module_cohorts[mid]
+        d_str = str(self.start_date + datetime.timedelta(days=day_off))
 
-    def save(self, exams, append):
-        """Sauvegarde les examens et la répartition nominative dans la DB."""
-        if not append:
-            self.cursor.execute("DELETE FROM examen_etudiants")
-            self.cursor.execute("DELETE FROM examens")
-        
-        for e in exams:
-            # insertion du créneau d'examen
-            self.cursor.execute("""
-                INSERT INTO examens (module_id, prof_surveillant_id, salle_id, date_examen, creneau_debut, creneau_fin)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (e['module_id'], e['prof_surveillant_id'], e['salle_id'], e['date_examen'], e['creneau_debut'], e['creneau_fin']))
-            
-            exam_id = self.cursor.lastrowid
+        # Recherche d'un créneau disponible dans la journée
+        for start_t, end_t in (slots or self.SLOTS):
+            # Trouver le minimum de salles libres couvrant l'effectif (selon la stratégie)
+            selected_rooms = self.free_rooms.select(d_str, start_t, n_students)
+            if selected_rooms is None: # Pas assez de place sur ce créneau
+                self.stats.probe(mid, "capacite_salles")
+                continue
+                
+            # Trouver un professeur surveillant par salle (même département prioritaire, moins chargés d'abord)
+            final_profs = self.proctors.select(d_str, m_dept, len(selected_rooms))
+            if final_profs is None: # Pas assez de profs
+                self.stats.probe(mid, "manque_surveillants")
+                continue
+                
+            # --- AFFECTATION EFFECTIVE ---
+            m_students = self.students_of(mid).tolist()
+            random.shuffle(m_students) # Mélange pour la répartition
+            student_idx = 0
+            entries = []
             
-            # Insertion en masse des liens Étudiant-Salle (Répartition nominative)
-            student_rows = [(exam_id, sid) for sid in e.get('students', [])]
-            if student_rows:
-                self.cursor.executemany("INSERT INTO examen_etudiants (examen_id, etudiant_id) VALUES (?, ?)", student_rows)
+            for i, (room_id, room_cap) in enumerate(selected_rooms):
+                pid = final_profs[i]
+                # Découpage de la liste des étudiants pour cette salle précise
+                assigned_students = m_students[student_idx : student_idx + room_cap]
+                student_idx += room_cap
+                
+                exam_entry = {
+                    'module_id': mid,
+                    'prof_surveillant_id': pid,
+                    'salle_id': room_id,
+                    'date_examen': d_str,
+                    'creneau_debut': start_t,
+                    'creneau_fin': end_t,
+                    'students': assigned_students # Étudiants rattachés à cette salle
+                }
+                entries.append(exam_entry)
                 
+                # Mise à jour de l'état de l'occupantion
+                self.proctors.assign(d_str, pid)
+            self.free_rooms.reserve(d_str, start_t, selected_rooms)
+            
+            # Marquer les cohortes comme occupées ce jour-là
+            self.cohort_days.mark(day_off, m_cohorts)
+            self.stats.probe(mid)
+            return entries # Créneau trouvé
+        return None
+
+
+    def save(self, exams, append, replace_modules=()):
+        """
+        Sauvegarde les examens et la répartition nominative dans la DB.
+        En mode incrémental, seuls les examens existants des modules re-planifiés (replace_modules) sont supprimés.
+
+        Les lignes sont d'abord préparées dans des tables temporaires (IDs locaux 1..N), puis basculées
+        en une seule transaction : les lecteurs voient l'ancien planning ou le nouveau, jamais un état partiel.
+        La même transaction réécrit student_timetable / proctor_timetable, recalcule dashboard_summary et incrémente
+        schedule_meta.generation (voir schedule_generation).
+        """
+        self._stage_begin()
+        self._stage_rows(exams, 1)
+        self._stage_commit(append, replace_modules)
+
+    def _stage_begin(self):
+        """Applique les PRAGMAs d'écriture (SQLite) et vide les tables temporaires de préparation."""
+        self.stats.phases["sauvegarde"] = 0.0
+        with self.stats.phase("sauvegarde"):
+            self._stage_prepare_tables()
+        self._staged_rows = 0
+
+    def _stage_prepare_tables(self):
         self.conn.commit()
+        if self.storage.dialect == "sqlite":
+            for pragma in SAVE_PRAGMAS:
+                self.cursor.execute(pragma)
+        # Tables temporaires (propres à la connexion) ; types date/heure du dialecte
+        self.cursor.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS staging_examens (
+                id INTEGER PRIMARY KEY, module_id INTEGER, prof_surveillant_id INTEGER, salle_id INTEGER,
+                date_examen {self.storage.DATE}, creneau_debut {self.storage.TIME}, creneau_fin {self.storage.TIME}
+            )""")
+        self.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS staging_examen_etudiants (examen_id INTEGER, etudiant_id INTEGER)")
+        self._stage_clear()
+
+    def _stage_clear(self):
+        """Vide les tables temporaires de préparation."""
+        self.cursor.execute("DELETE FROM staging_examens")
+        self.cursor.execute("DELETE FROM staging_examen_etudiants")
+
+    def _stage_rows(self, exams, first_id):
+        """Prépare un paquet d'examens (IDs locaux à partir de first_id), hors verrou de la base principale. Retourne le prochain ID."""
+        with self.stats.phase("sauvegarde"):
+            # Insertion en masse : executemany (SQLite) ou COPY (PostgreSQL)
+            self.storage.bulk_insert(
+                self.cursor, "staging_examens", STAGING_EXAM_COLUMNS,
+                ((i, e['module_id'], e['prof_surveillant_id'], e['salle_id'], e['date_examen'], e['creneau_debut'], e['creneau_fin'])
+                 for i, e in enumerate(exams, first_id)))
+            # Liens Étudiant-Salle (Répartition nominative)
+            self.storage.bulk_insert(
+                self.cursor, "staging_examen_etudiants", ("examen_id", "etudiant_id"),
+                ((i, sid) for i, e in enumerate(exams, first_id) for sid in e.get('students', [])))
+            self.conn.commit()
+        self._staged_rows += len(exams) + sum(len(e.get('students', [])) for e in exams)
+        return first_id + len(exams)
+
+    def _stage_commit(self, append, replace_modules=()):
+        """Bascule atomique : suppression de l'ancien planning et copie des lignes préparées avec les IDs définitifs."""
+        with self.stats.phase("sauvegarde"):
+            self._stage_swap(append, replace_modules)
+            self._stage_clear()
+            self.conn.commit()
+        elapsed = self.stats.phases["sauvegarde"]
+        n_rows = self._staged_rows
+        self.last_save_stats = {'rows': n_rows, 'seconds': elapsed, 'rows_per_sec': n_rows / elapsed if elapsed else 0.0}
+        print(f"Sauvegarde : {n_rows} lignes en {elapsed:.2f}s ({self.last_save_stats['rows_per_sec']:,.0f} lignes/s)")
+
+    def _stage_swap(self, append, replace_modules):
+        try:
+            self.storage.begin_write(self.cursor)
+            sql = self.storage.sql
+            if not append:
+                for table in ("student_timetable", "proctor_timetable", "examen_etudiants", "examens"):
+                    self.cursor.execute(f"DELETE FROM {table}")
+            else:
+                replaced = [(mid,) for mid in replace_modules]
+                self.cursor.executemany(sql("DELETE FROM student_timetable WHERE module_id = ?"), replaced)
+                self.cursor.executemany(sql("DELETE FROM proctor_timetable WHERE module_id = ?"), replaced)
+                self.cursor.executemany(sql("DELETE FROM examen_etudiants WHERE examen_id IN (SELECT id FROM examens WHERE module_id = ?)"), replaced)
+                self.cursor.executemany(sql("DELETE FROM examens WHERE module_id = ?"), replaced)
+
+            # Pré-allocation des IDs : décalage des IDs locaux au-delà du maximum existant
+            self.cursor.execute("SELECT COALESCE(MAX(id), 0) FROM examens")
+            offset = self.cursor.fetchone()[0]
+            self.cursor.execute(sql("""
+                INSERT INTO examens (id, module_id, prof_surveillant_id, salle_id, date_examen, creneau_debut, creneau_fin)
+                SELECT id + ?, module_id, prof_surveillant_id, salle_id, date_examen, creneau_debut, creneau_fin
+                FROM staging_examens
+            """), (offset,))
+            self.cursor.execute(sql("""
+                INSERT INTO examen_etudiants (examen_id, etudiant_id)
+                SELECT examen_id + ?, etudiant_id FROM staging_examen_etudiants
+            """), (offset,))
+            if self.storage.dialect == "postgresql":
+                # IDs explicites : la séquence SERIAL reprend après le dernier examen inséré
+                self.cursor.execute("SELECT setval(pg_get_serial_sequence('examens', 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM examens")
+            # Emplois du temps dénormalisés (lecture directe par étudiant / surveillant)
+            self.cursor.execute(sql("""
+                INSERT INTO student_timetable
+                SELECT ee.etudiant_id, e.date_examen, e.creneau_debut, e.creneau_fin, e.id + ?, e.module_id, m.nom, s.nom
+                FROM staging_examen_etudiants ee
+                JOIN staging_examens e ON e.id = ee.examen_id
+                JOIN modules m ON m.id = e.module_id
+                JOIN lieux_examen s ON s.id = e.salle_id
+                ORDER BY ee.etudiant_id
+            """), (offset,))
+            self.cursor.execute(sql("""
+                INSERT INTO proctor_timetable
+                SELECT e.prof_surveillant_id, e.date_examen, e.creneau_debut, e.creneau_fin, e.id + ?, e.module_id, m.nom, s.nom
+                FROM staging_examens e
+                JOIN modules m ON m.id = e.module_id
+                JOIN lieux_examen s ON s.id = e.salle_id
+                WHERE e.prof_surveillant_id IS NOT NULL
+            """), (offset,))
+            # Résumé du tableau de bord (totaux, répartitions, taux de conflits) du nouveau planning
+            for statement in DASHBOARD_SUMMARY_REFRESH:
+                self.cursor.execute(statement)
+            # Nouvelle génération : invalide les caches de requêtes de l'application
+            self.cursor.execute("UPDATE schedule_meta SET generation = generation + 1")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+
+def schedule_generation(conn):
+    """Numéro de la génération de planning courante (incrémenté par ExamScheduler.save)."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT generation FROM schedule_meta")
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else 0
+
+
+# --- Départs multiples : état des processus de calcul ---
+_worker_scheduler = None
+
+
+def _init_worker(scheduler):
+    """Reçoit une fois par processus le problème chargé (lecture seule)."""
+    global _worker_scheduler
+    _worker_scheduler = scheduler
+    _worker_scheduler.quiet = True
+
+
+def _run_start(task):
+    mode, mids, seed, noise = task
+    return _worker_scheduler.run_start(mode, mids, seed, noise)
@@ -1,10 +1,10 @@
 from optimizer import ExamScheduler
-from seed import create_connection
+from storage import DATABASE_URL
 import datetime
 
 def generate_now():
     print("Initializing Scheduler...")
-    db_path = "exams.db"
+    db_path = DATABASE_URL  # exams.db par défaut, ou postgresql://... via DATABASE_URL
     
     scheduler = ExamScheduler(db_path)
     
@@ -19,11 +19,8 @@ def generate_now():
     # Let's check optimizer.py... assuming it handles None -> all. If not, we fetch.
     # Looking at my memory of optimizer.py, it likely takes specific IDs or None.
     # Let's fetch all just to be sure.
-    import pandas as pd
-    conn = create_connection()
-    formations = pd.read_sql("SELECT id FROM formations", conn)
+    formations = scheduler.storage.read_frame(scheduler.conn, "SELECT id FROM formations")
     f_ids = formations['id'].tolist()
-    conn.close()
     
     count = scheduler.generate_schedule(start_date, end_date, f_ids, append=False)
     print(f"DONE. Generated {count} exam slots.")
@@ -6,6 +6,10 @@
 -- CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 
 -- Drop existing tables to ensure a clean slate for schema re-creation
+-- (schedule_meta est conservée : ses compteurs ne doivent jamais reculer, voir la section 11)
+DROP TABLE IF EXISTS dashboard_summary CASCADE;
+DROP TABLE IF EXISTS student_timetable CASCADE;
+DROP TABLE IF EXISTS proctor_timetable CASCADE;
 DROP TABLE IF EXISTS examen_etudiants CASCADE;
 DROP TABLE IF EXISTS examens CASCADE;
 DROP TABLE IF EXISTS inscriptions CASCADE;
@@ -18,13 +22,13 @@ DROP TABLE IF EXISTS departements CASCADE;
 
 -- Table des Facultés / Départements (ex: Faculté des Sciences)
 CREATE TABLE departements (
-    id INTEGER PRIMARY KEY, -- Identifiant unique du département
+    id SERIAL PRIMARY KEY, -- Identifiant unique du département
     nom TEXT NOT NULL UNIQUE -- Nom du département, doit être unique
 );
 
 -- Table des Spécialités (ex: Licence Informatique) rattachées à un département
 CREATE TABLE formations (
-    id INTEGER PRIMARY KEY, -- Identifiant unique de la formation
+    id SERIAL PRIMARY KEY, -- Identifiant unique de la formation
     nom TEXT NOT NULL, -- Nom de la formation
     dept_id INTEGER, -- Clé étrangère vers la table departements
     FOREIGN KEY(dept_id) REFERENCES departements(id) ON DELETE CASCADE -- Si un département est supprimé, ses formations le sont aussi
@@ -32,7 +36,7 @@ CREATE TABLE formations (
 
 -- Table des Professeurs assurant la surveillance
 CREATE TABLE professeurs (
-    id INTEGER PRIMARY KEY, -- Identifiant unique du professeur
+    id SERIAL PRIMARY KEY, -- Identifiant unique du professeur
     nom TEXT NOT NULL, -- Nom de famille du professeur
     prenom TEXT NOT NULL, -- Prénom du professeur
     dept_id INTEGER, -- Clé étrangère vers la table departements (peut être NULL si le professeur n'est pas rattaché à un département spécifique)
@@ -43,6 +47,11 @@ CREATE TABLE professeurs (
 
 -- Table des Étudiants inscrits à une formation spécifique
 CREATE TABLE etudiants (
+    id SERIAL PRIMARY KEY, -- Identifiant unique de l'étudiant
+    nom TEXT NOT NULL, -- Nom de famille
+    prenom TEXT NOT NULL, -- Prénom
+    formation_id INTEGER REFERENCES formations(id) ON DELETE CASCADE, -- Formation suivie
+    promo VARCHAR(20) -- Promotion (ex: L3)
 );
 
 -- 5. Modules (Matières)
@@ -51,7 +60,7 @@ CREATE TABLE modules (
     nom VARCHAR(100) NOT NULL,
     credits INTEGER DEFAULT 3,
     formation_id INTEGER REFERENCES formations(id) ON DELETE CASCADE,
-    semestre INTEGER CHECK (semestre > 0 AND semestre <= 6)
+    sem INTEGER CHECK (sem > 0 AND sem <= 6) -- Semestre
 );
 
 -- 6. Lieux d'examen (Salles, Amphis)
@@ -83,7 +92,84 @@ CREATE TABLE examens (
     CONSTRAINT check_duree CHECK (creneau_fin > creneau_debut)
 );
 
+-- 9. Répartition nominative des étudiants par salle d'examen
+CREATE TABLE examen_etudiants (
+    examen_id INTEGER REFERENCES examens(id) ON DELETE CASCADE,
+    etudiant_id INTEGER REFERENCES etudiants(id) ON DELETE CASCADE,
+    seat_number INTEGER,
+    PRIMARY KEY (examen_id, etudiant_id)
+);
+
+-- 10. Emplois du temps dénormalisés (réécrits à chaque sauvegarde du planning)
+CREATE TABLE student_timetable (
+    etudiant_id INTEGER,
+    date_examen DATE,
+    creneau_debut TIME,
+    creneau_fin TIME,
+    examen_id INTEGER,
+    module_id INTEGER,
+    module_nom TEXT,
+    salle_nom TEXT,
+    PRIMARY KEY (etudiant_id, date_examen, creneau_debut, examen_id)
+);
+
+CREATE TABLE proctor_timetable (
+    prof_id INTEGER,
+    date_examen DATE,
+    creneau_debut TIME,
+    creneau_fin TIME,
+    examen_id INTEGER,
+    module_id INTEGER,
+    module_nom TEXT,
+    salle_nom TEXT,
+    PRIMARY KEY (prof_id, date_examen, creneau_debut, examen_id)
+);
+
+-- 11. Compteur de générations du planning (clé des caches de l'application)
+--     et version des données du planificateur (inscriptions, salles, surveillants ; clé des instantanés)
+--     Conservée d'une recréation du schéma à l'autre : les compteurs sont incrémentés (caches invalidés), jamais remis à 0
+CREATE TABLE IF NOT EXISTS schedule_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    generation INTEGER NOT NULL DEFAULT 0
+);
+ALTER TABLE schedule_meta ADD COLUMN IF NOT EXISTS data_version INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE schedule_meta ADD COLUMN IF NOT EXISTS instance_id TEXT; -- Identifiant aléatoire de la base (distingue deux bases de même version)
+INSERT INTO schedule_meta (id, generation, instance_id) VALUES (1, 0, substr(md5(random()::text), 1, 16))
+    ON CONFLICT (id) DO NOTHING;
+UPDATE schedule_meta SET generation = generation + 1, data_version = data_version + 1;
+
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE schedule_meta SET data_version = data_version + 1;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER inscriptions_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON inscriptions
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+CREATE TRIGGER lieux_examen_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON lieux_examen
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+CREATE TRIGGER professeurs_data_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON professeurs
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
+
+-- 12. Résumé du tableau de bord (recalculé à chaque sauvegarde)
+CREATE TABLE dashboard_summary (
+    section TEXT,
+    label TEXT,
+    value DOUBLE PRECISION,
+    PRIMARY KEY (section, label)
+);
+
 -- Index pour optimiser les recherches de conflits
 CREATE INDEX idx_examens_date_creneau ON examens(date_examen, creneau_debut, creneau_fin);
 CREATE INDEX idx_inscriptions_module ON inscriptions(module_id);
 CREATE INDEX idx_etudiants_formation ON etudiants(formation_id);
+CREATE INDEX idx_modules_formation ON modules(formation_id);
+CREATE INDEX idx_examens_module ON examens(module_id);
+CREATE INDEX idx_examens_prof ON examens(prof_surveillant_id);
+CREATE INDEX idx_examen_etudiants_etudiant ON examen_etudiants(etudiant_id);
+CREATE INDEX idx_student_timetable_module ON student_timetable(module_id);
+CREATE INDEX idx_proctor_timetable_module ON proctor_timetable(module_id);
+-- Recherche d'étudiants par préfixe du nom ou du prénom ("Mon Planning")
+CREATE INDEX idx_etudiants_nom_prefix ON etudiants(lower(nom) text_pattern_ops);
+CREATE INDEX idx_etudiants_prenom_prefix ON etudiants(lower(prenom) text_pattern_ops);
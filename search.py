@@ -0,0 +1,17 @@
+# =========================================================================
+# RECHERCHE D'ÉTUDIANTS PAR NOM - UMBB
+# Requêtes plein texte (FTS5) sur l'index etudiants_fts (voir migrations.py)
+# =========================================================================
+
+
+def name_search_queries(text):
+    """
+    Expressions MATCH de etudiants_fts pour une saisie libre, par ordre de pertinence :
+    mots complets d'abord ("ben sa" -> "ben" "sa"), puis préfixes ("ben"* "sa"*).
+    Insensibles à la casse et aux accents ; liste vide si la saisie est vide.
+    Les mots sont cités : la saisie ne peut pas injecter de syntaxe FTS5.
+    """
+    words = ['"' + word.replace('"', '""') + '"' for word in text.split()]
+    if not words:
+        return []
+    return [" ".join(words), " ".join(w + "*" for w in words)]
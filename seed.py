@@ -3,10 +3,15 @@
 # Responsable de l'initialisation de la base de données avec 2500 étudiants
 # =========================================================================
 
+import argparse
+import contextlib
 import sqlite3
 import random
 import datetime
 
+from migrations import migrate, STUDENT_FTS_TRIGGERS, DATA_VERSION_TRIGGERS, DASHBOARD_SUMMARY_REFRESH
+from storage import DATABASE_URL, SQLiteStorage, open_storage
+
 # --- CONFIGURATION ---
 NUM_STUDENTS = 2500       # Nombre total d'étudiants à simuler
 NUM_PROFS = 200          # Nombre de professeurs surveillants
@@ -33,54 +38,73 @@ FIRST_NAMES_F = [
     "Amina", "Safia", "Bouchra", "Asma", "Souad", "Karima", "Fella", "Nour", "Ines"
 ]
 
+def amphi_label(i):
+    """Nom d'amphi : A..Z, puis AA, AB... au-delà de 26 amphis."""
+    label = ""
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        label = chr(65 + r) + label
+    return label
+
 def create_connection():
     """Crée une connexion à la base de données SQLite."""
     conn = sqlite3.connect(DB_NAME)
     return conn
 
-def init_db(conn):
-    """Initialise la structure de la base de données (Nettoyage et Création)."""
+def init_db(conn, storage=None):
+    """
+    Initialise la structure de la base de données (Nettoyage puis schéma à jour via les migrations).
+    storage : stockage de la connexion (défaut SQLite) ; sur PostgreSQL le schéma est recréé depuis schema.sql.
+    Les compteurs de schedule_meta (génération du planning, version des données) ne reculent jamais :
+    ils sont repris puis incrémentés, ce qui invalide les caches de l'application (voir app.cached_query).
+    """
+    if storage is not None and storage.dialect == "postgresql":
+        storage.create_schema(conn)  # schema.sql conserve et incrémente schedule_meta
+        return
     cursor = conn.cursor()
+    counters = {}
+    with contextlib.suppress(sqlite3.Error):  # Base neuve : pas encore de schedule_meta
+        cursor.execute("SELECT * FROM schedule_meta")
+        row = cursor.fetchone()
+        if row:
+            counters = dict(zip([d[0] for d in cursor.description], row))
     # Suppression des tables existantes pour repartir à zéro
     cursor.executescript("""
+        DROP TABLE IF EXISTS student_timetable;
+        DROP TABLE IF EXISTS proctor_timetable;
         DROP TABLE IF EXISTS examen_etudiants;
         DROP TABLE IF EXISTS examens;
         DROP TABLE IF EXISTS inscriptions;
         DROP TABLE IF EXISTS modules;
+        DROP TABLE IF EXISTS etudiants_fts;
         DROP TABLE IF EXISTS etudiants;
         DROP TABLE IF EXISTS formations;
         DROP TABLE IF EXISTS professeurs;
         DROP TABLE IF EXISTS lieux_examen;
         DROP TABLE IF EXISTS departements;
-
-        -- Création des tables selon le schéma défini
-        CREATE TABLE departements (id INTEGER PRIMARY KEY, nom TEXT);
-        CREATE TABLE formations (id INTEGER PRIMARY KEY, nom TEXT, dept_id INTEGER);
-        CREATE TABLE professeurs (id INTEGER PRIMARY KEY, nom TEXT, prenom TEXT, dept_id INTEGER);
-        CREATE TABLE etudiants (id INTEGER PRIMARY KEY, nom TEXT, prenom TEXT, formation_id INTEGER, promo TEXT);
-        CREATE TABLE modules (id INTEGER PRIMARY KEY, nom TEXT, credits INTEGER, formation_id INTEGER, sem INTEGER);
-        CREATE TABLE lieux_examen (id INTEGER PRIMARY KEY, nom TEXT, capacite INTEGER, type TEXT);
-        CREATE TABLE inscriptions (etudiant_id INTEGER, module_id INTEGER, note REAL);
-        CREATE TABLE examens (
-            id INTEGER PRIMARY KEY, 
-            module_id INTEGER, 
-            prof_surveillant_id INTEGER, 
-            salle_id INTEGER, 
-            date_examen TEXT, 
-            creneau_debut TEXT, 
-            creneau_fin TEXT
-        );
-        CREATE TABLE examen_etudiants (
-            examen_id INTEGER,
-            etudiant_id INTEGER,
-            seat_number INTEGER,
-            PRIMARY KEY (examen_id, etudiant_id)
-        );
+        DROP TABLE IF EXISTS schedule_meta;
+        PRAGMA user_version = 0;
     """)
+    # Création des tables et index selon le schéma défini (migrations.py)
+    migrate(conn, quiet=True)
+    cursor.execute("UPDATE schedule_meta SET generation = ?, data_version = ?",
+                   (counters.get("generation", 0) + 1, counters.get("data_version", 0) + 1))
     conn.commit()
 
-def generate_data(conn):
-    """Génère les données de test (UMBB) : Facultés, Modules, Profs, Étudiants."""
+def generate_data(conn, num_students=NUM_STUDENTS, num_profs=NUM_PROFS,
+                  num_rooms_small=NUM_ROOMS_SMALL, num_rooms_large=NUM_ROOMS_LARGE, seed=None, storage=None):
+    """
+    Génère les données de test (UMBB) : Facultés, Modules, Profs, Étudiants, Salles (volumes paramétrables).
+    Chargement en masse : IDs attribués en mémoire, executemany (SQLite) ou COPY (PostgreSQL) par table,
+    une seule transaction.
+    seed : graine du générateur aléatoire pour des jeux de données reproductibles.
+    storage : stockage de la connexion (défaut SQLite).
+    """
+    rng = random.Random(seed)
+    storage = storage or SQLiteStorage()
+    sqlite = storage.dialect == "sqlite"
+    insert = lambda table, columns, rows: storage.bulk_insert(cursor, table, columns, rows)
     cursor = conn.cursor()
     
     # --- 1. Structure Réelle de l'UMBB (Facultés et Spécialités) ---
@@ -116,64 +140,110 @@ def generate_data(conn):
         }
     }
     
-    all_formations = [] 
+    departements, formations, modules = [], [], []
+    modules_by_formation = {}  # ID Formation -> IDs Modules (précalculé une seule fois)
     
-    # Insertion des Facultés, Formations et Modules
-    for fac_name, specs in umbb_structure.items():
-        cursor.execute("INSERT INTO departements (nom) VALUES (?)", (fac_name,))
-        fac_id = cursor.lastrowid
+    # Facultés, Formations et Modules (IDs attribués séquentiellement sur tables vides)
+    for fac_id, (fac_name, specs) in enumerate(umbb_structure.items(), 1):
+        departements.append((fac_id, fac_name))
         
         for spec_name, modules_list in specs.items():
-            cursor.execute("INSERT INTO formations (nom, dept_id) VALUES (?, ?)", (spec_name, fac_id))
-            f_id = cursor.lastrowid
-            all_formations.append(f_id)
+            f_id = len(formations) + 1
+            formations.append((f_id, spec_name, fac_id))
+            modules_by_formation[f_id] = []
             
             for m_name in modules_list:
-                cursor.execute("INSERT INTO modules (nom, credits, formation_id, sem) VALUES (?, ?, ?, ?)", 
-                               (m_name, random.randint(3, 6), f_id, random.choice([1, 2])))
-            
-    conn.commit()
+                m_id = len(modules) + 1
+                modules.append((m_id, m_name, rng.randint(3, 6), f_id, rng.choice([1, 2])))
+                modules_by_formation[f_id].append(m_id)
 
-    # --- 2. Professeurs ---
-    fac_ids = [row[0] for row in cursor.execute("SELECT id FROM departements").fetchall()]
-    for _ in range(NUM_PROFS):
-        nom = random.choice(LAST_NAMES)
-        prenom = random.choice(FIRST_NAMES_M + FIRST_NAMES_F)
-        cursor.execute("INSERT INTO professeurs (nom, prenom, dept_id) VALUES (?, ?, ?)",
-                       (nom, prenom, random.choice(fac_ids)))
+    all_formations = list(modules_by_formation)
+    fac_ids = [d[0] for d in departements]
+    first_names = FIRST_NAMES_M + FIRST_NAMES_F
+    
+    # Distribution aléatoire des étudiants à travers les spécialités
+    student_formation = [rng.choice(all_formations) for _ in range(num_students)]
+    
+    def student_rows():
+        for s_id, f_id in enumerate(student_formation, 1):
+            yield (s_id, rng.choice(LAST_NAMES), rng.choice(first_names), f_id, "L3")
+    
+    def inscription_rows():
+        # Inscrire chaque étudiant à TOUS les modules de sa formation
+        for s_id, f_id in enumerate(student_formation, 1):
+            for m_id in modules_by_formation[f_id]:
+                yield (s_id, m_id)
     
-    # --- 3. Étudiants et Inscriptions ---
-    # Distribution aléatoire des 2500 étudiants à travers les spécialités
-    for _ in range(NUM_STUDENTS):
-        f_id = random.choice(all_formations)
-        nom = random.choice(LAST_NAMES)
-        prenom = random.choice(FIRST_NAMES_M + FIRST_NAMES_F)
+    # Réglage temporaire : pas de fsync pendant le chargement (base reconstructible)
+    if sqlite:
+        cursor.execute("PRAGMA synchronous")
+        sync_mode = cursor.fetchone()[0]
+        cursor.execute("PRAGMA synchronous=OFF")
+    try:
+        # Version des données (SQLite) : triggers par ligne suspendus, une seule incrémentation en fin de chargement.
+        # Transaction ouverte avant les DROP (sinon validés un à un) : un échec restaure aussi les triggers
+        if sqlite:
+            if not conn.in_transaction:
+                cursor.execute("BEGIN")
+            for name in DATA_VERSION_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        insert("departements", ("id", "nom"), departements)
+        insert("formations", ("id", "nom", "dept_id"), formations)
+        insert("modules", ("id", "nom", "credits", "formation_id", "sem"), modules)
         
-        cursor.execute("INSERT INTO etudiants (nom, prenom, formation_id, promo) VALUES (?, ?, ?, ?)",
-                       (nom, prenom, f_id, "L3"))
-        s_id = cursor.lastrowid
+        # --- 2. Professeurs ---
+        insert("professeurs", ("nom", "prenom", "dept_id"),
+               ((rng.choice(LAST_NAMES), rng.choice(first_names), rng.choice(fac_ids)) for _ in range(num_profs)))
         
-        # Inscrire l'étudiant à TOUS les modules de sa formation
-        f_modules = cursor.execute("SELECT id FROM modules WHERE formation_id = ?", (f_id,)).fetchall()
-        for m in f_modules:
-            cursor.execute("INSERT INTO inscriptions (etudiant_id, module_id) VALUES (?, ?)", (s_id, m[0]))
-            
-    conn.commit()
-
-    # --- 4. Lieux d'examen (Salles et Amphis) ---
-    for i in range(NUM_ROOMS_SMALL):
-        cursor.execute("INSERT INTO lieux_examen (nom, capacite, type) VALUES (?, ?, ?)",
-                       (f"Salle {i+1:02d}", 20, 'Salle'))
-    
-    for i in range(NUM_ROOMS_LARGE):
-        cursor.execute("INSERT INTO lieux_examen (nom, capacite, type) VALUES (?, ?, ?)",
-                       (f"Amphi {chr(65+i)}", 50, 'Amphi'))
+        # --- 3. Étudiants et Inscriptions ---
+        # Index plein texte des noms (SQLite) : reconstruit en une passe après le chargement (trigger suspendu)
+        if sqlite:
+            cursor.execute("DROP TRIGGER IF EXISTS etudiants_fts_ai")
+        insert("etudiants", ("id", "nom", "prenom", "formation_id", "promo"), student_rows())
+        if sqlite:
+            cursor.execute("INSERT INTO etudiants_fts(etudiants_fts) VALUES ('rebuild')")
+            cursor.execute(STUDENT_FTS_TRIGGERS["etudiants_fts_ai"])
+        insert("inscriptions", ("etudiant_id", "module_id"), inscription_rows())
         
-    conn.commit()
-    print("Database seeded realistically for UMBB (2500 students distributed).")
+        # --- 4. Lieux d'examen (Salles et Amphis) ---
+        insert("lieux_examen", ("nom", "capacite", "type"),
+               [(f"Salle {i+1:02d}", 20, 'Salle') for i in range(num_rooms_small)] +
+               [(f"Amphi {amphi_label(i)}", 50, 'Amphi') for i in range(num_rooms_large)])
+        if sqlite:
+            for sql in DATA_VERSION_TRIGGERS.values():
+                cursor.execute(sql)
+        if not sqlite:
+            # IDs explicites : les séquences SERIAL reprennent après le dernier ID chargé
+            for table in ("departements", "formations", "modules", "etudiants", "examens"):
+                cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {table}")
+        
+        # --- 5. Résumé du tableau de bord (effectifs, salles) ---
+        for sql in DASHBOARD_SUMMARY_REFRESH:
+            cursor.execute(sql)
+        # Nouvelle génération (invalide les caches de l'application) et nouvelle version des données (instantanés)
+        cursor.execute("UPDATE schedule_meta SET generation = generation + 1, data_version = data_version + 1")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if sqlite:
+            cursor.execute(f"PRAGMA synchronous={sync_mode}")
+    print(f"Database seeded realistically for UMBB ({num_students} students distributed).")
 
 if __name__ == "__main__":
-    conn = create_connection()
-    init_db(conn)
-    generate_data(conn)
+    parser = argparse.ArgumentParser(description="Génère une base de démonstration UMBB")
+    parser.add_argument("--students", type=int, default=NUM_STUDENTS, help="Nombre d'étudiants")
+    parser.add_argument("--profs", type=int, default=NUM_PROFS, help="Nombre de professeurs surveillants")
+    parser.add_argument("--rooms-small", type=int, default=NUM_ROOMS_SMALL, help="Nombre de salles (capacité 20)")
+    parser.add_argument("--rooms-large", type=int, default=NUM_ROOMS_LARGE, help="Nombre d'amphis (capacité 50)")
+    parser.add_argument("--seed", type=int, default=None, help="Graine aléatoire (données reproductibles)")
+    parser.add_argument("--db", default=DATABASE_URL,
+                        help="Base cible : chemin SQLite ou URL (sqlite:///exams.db, postgresql://...) ; défaut $DATABASE_URL")
+    args = parser.parse_args()
+    
+    storage = open_storage(args.db)
+    conn = storage.connect()
+    init_db(conn, storage)
+    generate_data(conn, args.students, args.profs, args.rooms_small, args.rooms_large, seed=args.seed, storage=storage)
     conn.close()
@@ -0,0 +1,80 @@
+# =========================================================================
+# INSTANTANÉS DU PROBLÈME - UMBB
+# Tableaux chargés par ExamScheduler.get_data persistés en fichiers .npy,
+# relus en mémoire partagée (mmap) tant que la version des données n'a pas changé
+# =========================================================================
+
+import contextlib
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+SNAPSHOT_DIR = os.environ.get("UMBB_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "umbb_snapshots"))
+SNAPSHOT_FORMAT = 2  # À incrémenter si le contenu ou le calcul des tableaux change
+SNAPSHOT_KEEP = 4    # Instantanés conservés (les plus récents)
+
+
+def snapshot_key(storage, conn):
+    """
+    Clé (hex) de l'instantané des données courantes : emplacement et identifiant aléatoire de la base,
+    version de ses données (schedule_meta.data_version, incrémentée par triggers à toute modification
+    des inscriptions, salles ou surveillants ; voir migrations.py).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT instance_id, data_version FROM schedule_meta")
+    instance_id, data_version = cursor.fetchone()
+    cursor.close()
+    ident = f"format={SNAPSHOT_FORMAT};base={storage.location};instance={instance_id};version={data_version}"
+    return hashlib.sha1(ident.encode()).hexdigest()[:20]
+
+
+def snapshot_path(key, directory=SNAPSHOT_DIR):
+    return os.path.join(directory, key)
+
+
+def load_snapshot(key, directory=SNAPSHOT_DIR):
+    """
+    Tableaux de l'instantané {nom: tableau en lecture seule projeté en mémoire}, ou None s'il n'existe pas
+    (ou plus : supprimé entre-temps par un autre processus).
+    Les pages sont partagées entre processus (cache du système de fichiers) et chargées à la demande.
+    """
+    path = snapshot_path(key, directory)
+    with contextlib.suppress(OSError):
+        os.utime(path)  # Instantané récemment utilisé (voir prune_snapshots)
+    try:
+        return {name[:-4]: np.load(os.path.join(path, name), mmap_mode="r")
+                for name in os.listdir(path) if name.endswith(".npy")}
+    except OSError:
+        return None
+
+
+def save_snapshot(key, arrays, directory=SNAPSHOT_DIR):
+    """
+    Écrit les tableaux {nom: tableau} dans l'instantané (écriture atomique : dossier temporaire renommé).
+    Retourne le chemin de l'instantané ; sans effet s'il existe déjà (écrit par un autre processus).
+    """
+    path = snapshot_path(key, directory)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=f".{key}.", dir=directory)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, name + ".npy"), np.ascontiguousarray(array))
+        os.replace(tmp_path, path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    prune_snapshots(directory)
+    return path
+
+
+def prune_snapshots(directory=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP):
+    """Supprime les instantanés les moins récemment utilisés au-delà de `keep`."""
+    entries = [os.path.join(directory, name) for name in os.listdir(directory) if not name.startswith(".")]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for path in entries[keep:]:
+        shutil.rmtree(path, ignore_errors=True)
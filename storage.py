@@ -0,0 +1,212 @@
+# =========================================================================
+# COUCHE DE STOCKAGE - UMBB
+# Même interface pour SQLite (démo, sqlite3) et PostgreSQL (production, SQLAlchemy + psycopg2)
+# =========================================================================
+
+import csv
+import io
+import itertools
+import os
+import sqlite3
+
+import pandas as pd
+
+from migrations import migrate
+
+try:
+    import sqlalchemy as sa
+except ImportError:  # SQLAlchemy n'est nécessaire que pour PostgreSQL
+    sa = None
+
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///exams.db")
+STREAM_CHUNK_ROWS = 5000  # Lignes par paquet des lectures en flux (curseur serveur sur PostgreSQL)
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
+
+
+class SQLiteStorage:
+    """
+    Base SQLite (fichier local). Les requêtes utilisent le style de paramètres "?" ;
+    le schéma est tenu à jour par migrations.py.
+    """
+    dialect = "sqlite"
+    Error = sqlite3.Error
+    DATE = TIME = "TEXT"  # Dates "AAAA-MM-JJ" et heures "HH:MM" stockées en texte
+
+    def __init__(self, path=None):
+        self.path = path  # Inutile pour les opérations sur une connexion déjà ouverte
+
+    @property
+    def location(self):
+        """Identité de la base : chemin absolu du fichier."""
+        return os.path.abspath(self.path)
+
+    def connect(self, readonly=False):
+        """
+        Connexion DB-API ; readonly : ouverture en lecture seule (mode=ro), utilisable depuis un autre thread
+        que celui qui l'a ouverte (pool de lecture de l'application, un seul utilisateur à la fois).
+        """
+        if readonly:
+            return sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True, check_same_thread=False)
+        return sqlite3.connect(self.path)
+
+    def sql(self, query):
+        """Requête écrite avec des paramètres "?" dans le style du pilote."""
+        return query
+
+    def migrate(self, conn, quiet=False):
+        return migrate(conn, quiet)
+
+    def begin_write(self, cursor):
+        """Ouvre la transaction de bascule d'un planning (verrou d'écriture immédiat)."""
+        cursor.execute("BEGIN IMMEDIATE")
+
+    def bulk_insert(self, cursor, table, columns, rows):
+        """Insertion en masse (executemany) de lignes (itérable de tuples)."""
+        cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows)
+
+    def read_frame(self, conn, query, params=None):
+        return pd.read_sql(query, conn, params=params)
+
+    def iter_rows(self, conn, query, params=(), chunk_size=STREAM_CHUNK_ROWS):
+        """Résultat d'une requête par paquets de chunk_size lignes (fetchmany)."""
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+class _CopyBuffer(io.TextIOBase):
+    """Fichier en lecture produisant à la demande le CSV d'un itérable de lignes (COPY ... FROM STDIN)."""
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._pending = ""
+        self._out = io.StringIO()
+        self._writer = csv.writer(self._out, lineterminator="\n")
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._pending) < size:
+            chunk = list(itertools.islice(self._rows, 1000))
+            if not chunk:
+                break
+            self._writer.writerows(chunk)
+            self._pending += self._out.getvalue()
+            self._out.seek(0)
+            self._out.truncate()
+        if size < 0:
+            data, self._pending = self._pending, ""
+        else:
+            data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+
+class PostgresStorage:
+    """
+    Base PostgreSQL via SQLAlchemy (pool de connexions) et psycopg2 :
+    COPY pour les écritures en masse, curseurs serveur pour les lectures volumineuses.
+    Le schéma est créé à partir de schema.sql.
+    """
+    dialect = "postgresql"
+    DATE, TIME = "DATE", "TIME"
+
+    def __init__(self, url):
+        if sa is None:
+            raise ImportError("PostgreSQL nécessite SQLAlchemy et psycopg2 (pip install sqlalchemy psycopg2-binary)")
+        import psycopg2
+        import psycopg2.extensions
+        self.Error = psycopg2.Error
+        # DATE et TIME lus comme sous SQLite ("AAAA-MM-JJ", "HH:MM") : le reste du code manipule des chaînes
+        psycopg2.extensions.register_type(psycopg2.extensions.new_type((1082,), "UMBB_DATE", lambda v, cur: v))
+        psycopg2.extensions.register_type(psycopg2.extensions.new_type((1083,), "UMBB_TIME", lambda v, cur: v and v[:5]))
+        self.engine = sa.create_engine(url, pool_pre_ping=True)
+
+    @property
+    def location(self):
+        """Identité de la base : URL de connexion (sans le mot de passe)."""
+        return self.engine.url.render_as_string(hide_password=True)
+
+    def connect(self, readonly=False):
+        """
+        Connexion DB-API (psycopg2) issue du pool SQLAlchemy ; close() la rend au pool.
+        readonly est sans effet (les connexions du pool sont partagées) : droits gérés par le rôle PostgreSQL.
+        """
+        return self.engine.raw_connection()
+
+    def sql(self, query):
+        """
+        Conversion des paramètres "?" en "%s" (psycopg2) ; les requêtes du projet n'ont pas de "?" littéral.
+        Les "%" littéraux sont doublés : toujours exécuter avec un tuple de paramètres (éventuellement vide).
+        """
+        return query.replace("%", "%%").replace("?", "%s")
+
+    def migrate(self, conn, quiet=False):
+        """Crée le schéma (schema.sql) si la base est vide. Retourne la liste des versions appliquées."""
+        cursor = conn.cursor()
+        cursor.execute("SELECT to_regclass('public.examens')")
+        exists = cursor.fetchone()[0] is not None
+        conn.commit()  # Pas de transaction laissée ouverte sur la connexion
+        if exists:
+            return []
+        self.create_schema(conn)
+        if not quiet:
+            print("Schéma PostgreSQL créé (schema.sql)")
+        return ["schema.sql"]
+
+    def create_schema(self, conn):
+        """(Re)crée toutes les tables à partir de schema.sql (les tables existantes sont supprimées)."""
+        with open(SCHEMA_FILE, encoding="utf-8") as f:
+            conn.cursor().execute(f.read())
+        conn.commit()
+
+    def begin_write(self, cursor):
+        """Transaction de bascule : verrou excluant les autres écrivains du planning, lectures permises."""
+        cursor.execute("LOCK TABLE examens IN SHARE ROW EXCLUSIVE MODE")
+
+    def bulk_insert(self, cursor, table, columns, rows):
+        """COPY ... FROM STDIN (CSV produit au fil de l'eau, sans tout matérialiser)."""
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", _CopyBuffer(rows))
+
+    def read_frame(self, conn, query, params=None):
+        cursor = conn.cursor()
+        cursor.execute(self.sql(query), tuple(params or ()))
+        frame = pd.DataFrame.from_records(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+        cursor.close()
+        return frame
+
+    def iter_rows(self, conn, query, params=(), chunk_size=STREAM_CHUNK_ROWS):
+        """Curseur serveur (nommé) : le résultat est transféré par paquets, jamais en entier."""
+        cursor = conn.cursor(name="umbb_stream")
+        cursor.itersize = chunk_size
+        cursor.execute(self.sql(query), tuple(params or ()))
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+def open_storage(url=None):
+    """
+    Stockage désigné par une URL (sqlite:///chemin.db, postgresql://...) ou un simple chemin de fichier SQLite.
+    Défaut : variable d'environnement DATABASE_URL, sinon sqlite:///exams.db.
+    """
+    url = url or DATABASE_URL
+    if url.startswith(("postgresql:", "postgres:")):
+        # Pilote psycopg2 explicite (COPY et conversions de types en dépendent ; SQLAlchemy 2.1 choisit psycopg 3 par défaut)
+        return PostgresStorage("postgresql+psycopg2:" + url.split(":", 1)[1])
+    if url.startswith("postgresql+"):
+        return PostgresStorage(url)
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SQLiteStorage(url)